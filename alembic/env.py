@@ -17,7 +17,7 @@ if config.config_file_name is not None:
 # add your model's MetaData object here
 # for 'autogenerate' support
 from app.database import Base
-from app.models import User, Message, Task, Expense, Debt
+from app.models import User, Message, Task, Expense, Debt, AnalysisCacheEntry, Balance, DebtCompaction, ArchivedDebt, Group, GroupMember, DataVersion, BrokerPayload
 from app.config import settings
 
 target_metadata = Base.metadata
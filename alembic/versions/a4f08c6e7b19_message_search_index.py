@@ -0,0 +1,36 @@
+"""Full-text search index on message content
+
+Revision ID: a4f08c6e7b19
+Revises: e5b1a8d2c4f7
+Create Date: 2026-10-17 14:00:00.000000
+
+GIN index over to_tsvector('turkish', content). It is an expression
+index, so new and edited messages are indexed by PostgreSQL itself and
+no column or trigger is needed; search queries must use the same
+expression (app.models.search_vector). Built CONCURRENTLY so the
+migration does not block writes.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4f08c6e7b19'
+down_revision: Union[str, None] = 'e5b1a8d2c4f7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY ix_messages_content_fts ON messages "
+            "USING gin (to_tsvector('turkish', content))"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY ix_messages_content_fts")
@@ -0,0 +1,33 @@
+"""Change counters for ETags
+
+Revision ID: a8e4c2f6d0b3
+Revises: f1a3c5e7d9b2
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8e4c2f6d0b3'
+down_revision: Union[str, None] = 'f1a3c5e7d9b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Starts empty: a missing row is version 0, and every client's first
+    # request after the upgrade is a full response anyway
+    op.create_table('data_versions',
+    sa.Column('scope', sa.String(length=20), nullable=False),
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('scope', 'owner_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('data_versions')
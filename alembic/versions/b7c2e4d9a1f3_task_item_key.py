@@ -0,0 +1,55 @@
+"""Stemmed item key on tasks for expense matching
+
+Revision ID: b7c2e4d9a1f3
+Revises: a4f08c6e7b19
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.ai.text import item_key
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7c2e4d9a1f3'
+down_revision: Union[str, None] = 'a4f08c6e7b19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+
+def upgrade() -> None:
+    op.add_column('tasks', sa.Column('item_key', sa.String(length=200), nullable=True))
+
+    # Keys come from the Python stemmer, so backfill in batches from here
+    conn = op.get_bind()
+    tasks = sa.table('tasks', sa.column('id', sa.Integer), sa.column('item_name', sa.String), sa.column('item_key', sa.String))
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(tasks.c.id, tasks.c.item_name)
+            .where(tasks.c.id > last_id)
+            .order_by(tasks.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        conn.execute(
+            tasks.update().where(tasks.c.id == sa.bindparam('task_id')).values(item_key=sa.bindparam('key')),
+            [{'task_id': row.id, 'key': item_key(row.item_name)} for row in rows]
+        )
+        last_id = rows[-1].id
+
+    op.create_index(
+        'ix_tasks_open_pair', 'tasks', ['created_by', 'assigned_to'],
+        postgresql_where=sa.text("status IN ('PENDING', 'IN_PROGRESS')")
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tasks_open_pair', table_name='tasks')
+    op.drop_column('tasks', 'item_key')
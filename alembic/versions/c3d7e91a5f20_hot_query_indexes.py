@@ -0,0 +1,55 @@
+"""Composite and partial indexes for hot query shapes
+
+Revision ID: c3d7e91a5f20
+Revises: 8f2a61c0d9b4
+Create Date: 2026-10-17 12:00:00.000000
+
+Indexes are built CONCURRENTLY so the migration does not block writes
+on large tables. See benchmarks/query_indexes.py for plans and latency
+before and after.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3d7e91a5f20'
+down_revision: Union[str, None] = '8f2a61c0d9b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (name, table, columns, partial index condition)
+INDEXES = [
+    ('ix_messages_sender_receiver_created', 'messages', ['sender_id', 'receiver_id', 'created_at'], None),
+    ('ix_messages_receiver_sender_created', 'messages', ['receiver_id', 'sender_id', 'created_at'], None),
+    ('ix_messages_pending_analysis', 'messages', ['id'], 'ai_analysis IS NULL'),
+    ('ix_tasks_created_by_status_created', 'tasks', ['created_by', 'status', 'created_at'], None),
+    ('ix_tasks_assigned_to_status_created', 'tasks', ['assigned_to', 'status', 'created_at'], None),
+    ('ix_debts_active_debtor_creditor_created', 'debts', ['debtor_id', 'creditor_id', 'created_at'], "status = 'ACTIVE'"),
+    ('ix_debts_active_creditor', 'debts', ['creditor_id', 'debtor_id'], "status = 'ACTIVE'"),
+    ('ix_debts_debtor_created', 'debts', ['debtor_id', 'created_at'], None),
+    ('ix_debts_creditor_created', 'debts', ['creditor_id', 'created_at'], None),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name, table, columns,
+                postgresql_where=sa.text(where) if where else None,
+                postgresql_concurrently=True
+            )
+    op.execute('ANALYZE messages')
+    op.execute('ANALYZE tasks')
+    op.execute('ANALYZE debts')
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
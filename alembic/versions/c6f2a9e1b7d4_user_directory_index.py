@@ -0,0 +1,35 @@
+"""Case-insensitive username index for the user directory
+
+Revision ID: c6f2a9e1b7d4
+Revises: a8e4c2f6d0b3
+Create Date: 2026-10-17 21:00:00.000000
+
+Expression index over (lower(username) COLLATE "C", id). Directory
+queries use the same expression (app.models.username_key) for both the
+prefix range and the ORDER BY, so a page is an index range scan. Built
+CONCURRENTLY so the migration does not block registrations.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6f2a9e1b7d4'
+down_revision: Union[str, None] = 'a8e4c2f6d0b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY ix_users_username_key ON users "
+            "((lower(username) COLLATE \"C\"), id)"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY ix_users_username_key")
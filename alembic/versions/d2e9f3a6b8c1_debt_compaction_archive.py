@@ -0,0 +1,60 @@
+"""Debt compaction audit and settled debt archive
+
+Revision ID: d2e9f3a6b8c1
+Revises: b7c2e4d9a1f3
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2e9f3a6b8c1'
+down_revision: Union[str, None] = 'b7c2e4d9a1f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('debt_compactions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_a', sa.Integer(), nullable=False),
+    sa.Column('user_b', sa.Integer(), nullable=False),
+    sa.Column('debt_count', sa.Integer(), nullable=False),
+    sa.Column('a_owed', sa.Float(), nullable=False),
+    sa.Column('b_owed', sa.Float(), nullable=False),
+    sa.Column('result_debt_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['user_a'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['user_b'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_debt_compactions_id'), 'debt_compactions', ['id'], unique=False)
+    op.create_table('debts_archive',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('debtor_id', sa.Integer(), nullable=False),
+    sa.Column('creditor_id', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('status', postgresql.ENUM('ACTIVE', 'SETTLED', name='debtstatus', create_type=False), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('compaction_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['compaction_id'], ['debt_compactions.id'], ),
+    sa.ForeignKeyConstraint(['creditor_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['debtor_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_debts_archive_debtor_created', 'debts_archive', ['debtor_id', 'created_at'], unique=False)
+    op.create_index('ix_debts_archive_creditor_created', 'debts_archive', ['creditor_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_debts_archive_creditor_created', table_name='debts_archive')
+    op.drop_index('ix_debts_archive_debtor_created', table_name='debts_archive')
+    op.drop_table('debts_archive')
+    op.drop_index(op.f('ix_debt_compactions_id'), table_name='debt_compactions')
+    op.drop_table('debt_compactions')
@@ -0,0 +1,55 @@
+"""Pairwise balance table
+
+Revision ID: e5b1a8d2c4f7
+Revises: c3d7e91a5f20
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b1a8d2c4f7'
+down_revision: Union[str, None] = 'c3d7e91a5f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('balances',
+    sa.Column('user_a', sa.Integer(), nullable=False),
+    sa.Column('user_b', sa.Integer(), nullable=False),
+    sa.Column('a_owes', sa.Float(), nullable=False),
+    sa.Column('b_owes', sa.Float(), nullable=False),
+    sa.Column('net_amount', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['user_a'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['user_b'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_a', 'user_b')
+    )
+    op.create_index('ix_balances_user_b', 'balances', ['user_b'], unique=False)
+
+    # Backfill from active debts; user_a is always the smaller id
+    op.execute("""
+        INSERT INTO balances (user_a, user_b, a_owes, b_owes, net_amount)
+        SELECT
+            user_a, user_b, a_owes, b_owes, b_owes - a_owes
+        FROM (
+            SELECT
+                LEAST(debtor_id, creditor_id) AS user_a,
+                GREATEST(debtor_id, creditor_id) AS user_b,
+                SUM(CASE WHEN debtor_id < creditor_id THEN amount ELSE 0 END) AS a_owes,
+                SUM(CASE WHEN debtor_id > creditor_id THEN amount ELSE 0 END) AS b_owes
+            FROM debts
+            WHERE status = 'ACTIVE' AND debtor_id <> creditor_id
+            GROUP BY 1, 2
+        ) totals
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_balances_user_b', table_name='balances')
+    op.drop_table('balances')
@@ -0,0 +1,29 @@
+"""Attempt counter and claim lease for message analysis
+
+Revision ID: e7a3d5b9c2f1
+Revises: c6f2a9e1b7d4
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a3d5b9c2f1'
+down_revision: Union[str, None] = 'c6f2a9e1b7d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # A constant server default, so PostgreSQL adds the column without rewriting the table
+    op.add_column('messages', sa.Column('analysis_attempts', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('messages', sa.Column('analysis_claimed_until', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('messages', 'analysis_claimed_until')
+    op.drop_column('messages', 'analysis_attempts')
@@ -0,0 +1,50 @@
+"""Groups and group expenses
+
+Revision ID: f1a3c5e7d9b2
+Revises: d2e9f3a6b8c1
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1a3c5e7d9b2'
+down_revision: Union[str, None] = 'd2e9f3a6b8c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('groups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('created_by', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['created_by'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_groups_id'), 'groups', ['id'], unique=False)
+    op.create_table('group_members',
+    sa.Column('group_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('joined_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['group_id'], ['groups.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('group_id', 'user_id')
+    )
+    op.create_index('ix_group_members_user', 'group_members', ['user_id'], unique=False)
+    op.add_column('expenses', sa.Column('group_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('expenses_group_id_fkey', 'expenses', 'groups', ['group_id'], ['id'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('expenses_group_id_fkey', 'expenses', type_='foreignkey')
+    op.drop_column('expenses', 'group_id')
+    op.drop_index('ix_group_members_user', table_name='group_members')
+    op.drop_table('group_members')
+    op.drop_index(op.f('ix_groups_id'), table_name='groups')
+    op.drop_table('groups')
@@ -0,0 +1,33 @@
+"""Store oversized WebSocket broker events
+
+Revision ID: f4b8d1c6a9e2
+Revises: e7a3d5b9c2f1
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4b8d1c6a9e2'
+down_revision: Union[str, None] = 'e7a3d5b9c2f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('broker_payloads',
+    sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_broker_payloads_created_at'), 'broker_payloads', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_broker_payloads_created_at'), table_name='broker_payloads')
+    op.drop_table('broker_payloads')
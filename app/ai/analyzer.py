@@ -1,6 +1,14 @@
-from sqlalchemy.orm import Session
-from app.ai.gemini import GeminiClient
-from app.models import Message, Task, Expense, Debt, User, TaskStatus, DebtStatus
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.ai.gemini import GeminiClient, FALLBACK_ANALYSIS
+from app.ai.rules import rule_classifier
+from app.ai.cache import analysis_cache
+from app.ai.batcher import gemini_batcher
+from app.ai.matching import find_open_task
+from app.ledger.balances import get_pair_balance
+from app.ledger.splits import split_equally, add_expense_debts
+from app.ledger.settlement import settle_debts, NoActiveDebtsError
+from app.models import Message, Task, Expense, User, TaskStatus
 from datetime import datetime
 from typing import Dict, Any, Optional
 
@@ -8,36 +16,59 @@ from typing import Dict, Any, Optional
 class MessageAnalyzer:
     """Handles message analysis and automatic task/expense creation"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
         self.gemini = GeminiClient()
     
-    def analyze_and_process(
+    async def analyze_and_process(
         self, 
         message: Message, 
         sender: User, 
-        receiver: User
+        receiver: User,
+        raise_on_error: bool = False
     ) -> Dict[str, Any]:
         """
         Analyze a message and create tasks/expenses/payments if needed
         
+        Args:
+            raise_on_error: Raise GeminiError instead of storing a "normal"
+                fallback, leaving the message pending for a retry
+        
         Returns:
             dict: Processing result with created tasks, expenses, debts, and payments
         """
+        analysis = await self.classify(message, sender, receiver, raise_on_error)
+        result = await self.apply(message, sender, receiver, analysis)
+        await self.db.commit()
+        return result
+    
+    async def classify(
+        self,
+        message: Message,
+        sender: User,
+        receiver: User,
+        raise_on_error: bool = False
+    ) -> Dict[str, Any]:
+        """Analyze a message without changing anything but the analysis cache"""
         print(f"[AI ANALYZER] Starting analysis for: '{message.content}'")
+        return await self._classify(message, sender, receiver, raise_on_error)
+    
+    async def apply(
+        self,
+        message: Message,
+        sender: User,
+        receiver: User,
+        analysis: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Create the tasks/expenses/payments of an analysis and store it on the message
         
-        # Analyze message with Gemini
-        analysis = self.gemini.analyze_message(
-            message.content,
-            sender.username,
-            receiver.username
-        )
-        print(f"[AI ANALYZER] Gemini returned: {analysis}")
-        
-        # Store analysis result
-        message.ai_analysis = analysis
-        self.db.commit()
+        Everything is written in the session's transaction and ai_analysis is
+        set last; the caller commits, so either all of it is stored or none.
         
+        Returns:
+            dict: Processing result with created tasks, expenses, debts, and payments
+        """
         result = {
             "analysis": analysis,
             "task": None,
@@ -48,11 +79,11 @@ class MessageAnalyzer:
         
         # Process based on analysis type
         if analysis["type"] == "task" and analysis["item"]:
-            result["task"] = self._create_task(message, sender, receiver, analysis["item"])
+            result["task"] = await self._create_task(message, sender, receiver, analysis["item"])
         
         elif analysis["type"] == "expense" and analysis["item"] and analysis["amount"]:
             result.update(
-                self._process_expense(
+                await self._process_expense(
                     message, 
                     sender, 
                     receiver, 
@@ -62,16 +93,56 @@ class MessageAnalyzer:
             )
         
         elif analysis["type"] == "payment":
-            result["payment"] = self._process_payment(
+            result["payment"] = await self._process_payment(
                 message, 
                 sender, 
                 receiver, 
                 analysis.get("amount")
             )
         
+        # Store analysis result
+        message.ai_analysis = analysis
+        await self.db.flush()
+        
         return result
     
-    def _create_task(
+    async def _classify(
+        self,
+        message: Message,
+        sender: User,
+        receiver: User,
+        raise_on_error: bool
+    ) -> Dict[str, Any]:
+        """Classify with the rule-based fast path and the cache, falling back to Gemini"""
+        analysis = rule_classifier.classify(message.content)
+        if analysis is not None:
+            print(f"[AI ANALYZER] Rules matched: {analysis}")
+            return analysis
+        
+        analysis = await analysis_cache.get(message.content, self.db)
+        if analysis is not None:
+            print(f"[AI ANALYZER] Cache hit: {analysis}")
+            return analysis
+        
+        if not settings.GOOGLE_API_KEY:
+            # No Gemini to ask (or to retry): messages the rules miss are ordinary conversation
+            print("[AI ANALYZER] No GOOGLE_API_KEY, storing fallback analysis")
+            return dict(FALLBACK_ANALYSIS)
+        
+        # Analyze message with Gemini, batched with concurrent messages
+        analysis = await gemini_batcher.analyze(
+            message.content,
+            sender.username,
+            receiver.username,
+            raise_on_error=raise_on_error
+        )
+        print(f"[AI ANALYZER] Gemini returned: {analysis}")
+        
+        if analysis != FALLBACK_ANALYSIS:
+            await analysis_cache.set(message.content, analysis, self.db)
+        return analysis
+    
+    async def _create_task(
         self, 
         message: Message, 
         creator: User, 
@@ -88,12 +159,12 @@ class MessageAnalyzer:
         )
         
         self.db.add(task)
-        self.db.commit()
-        self.db.refresh(task)
+        await self.db.flush()
+        await self.db.refresh(task)
         
         return task
     
-    def _process_expense(
+    async def _process_expense(
         self, 
         message: Message, 
         payer: User, 
@@ -113,14 +184,10 @@ class MessageAnalyzer:
             "debt": None
         }
         
-        # Find related pending task for this item
-        task = self.db.query(Task).filter(
-            Task.item_name.ilike(f"%{item_name}%"),
-            Task.status.in_([TaskStatus.PENDING, TaskStatus.IN_PROGRESS]),
-            ((Task.created_by == payer.id) | (Task.assigned_to == payer.id))
-        ).first()
+        # Find the open task between the two users that best matches this item
+        task = await find_open_task(self.db, item_name, payer.id, other_user.id)
         
-        # If no exact match, create a new task
+        # If nothing matches, create a new task
         if not task:
             task = Task(
                 created_by=payer.id,
@@ -131,7 +198,7 @@ class MessageAnalyzer:
                 completed_at=datetime.utcnow()
             )
             self.db.add(task)
-            self.db.flush()
+            await self.db.flush()
         else:
             # Complete the existing task
             task.status = TaskStatus.COMPLETED
@@ -146,31 +213,21 @@ class MessageAnalyzer:
             amount=amount
         )
         self.db.add(expense)
-        self.db.flush()
+        await self.db.flush()
         result["expense"] = expense
         
-        # Calculate and create debt
-        # Split the expense equally between two users
-        split_amount = amount / 2
-        
-        # The other user owes the payer their share
-        debt = Debt(
-            debtor_id=other_user.id,
-            creditor_id=payer.id,
-            amount=split_amount,
-            status=DebtStatus.ACTIVE
-        )
-        self.db.add(debt)
+        # Split the expense equally; the other user owes the payer their share
+        shares = split_equally(amount, [payer.id, other_user.id])
+        debts = await add_expense_debts(self.db, payer.id, shares)
         
-        self.db.commit()
-        self.db.refresh(expense)
-        self.db.refresh(debt)
+        await self.db.flush()
+        await self.db.refresh(expense)
         
-        result["debt"] = debt
+        result["debt"] = debts[0] if debts else None
         
         return result
     
-    def _process_payment(
+    async def _process_payment(
         self, 
         message: Message, 
         payer: User,
@@ -191,14 +248,9 @@ class MessageAnalyzer:
         """
         print(f"[PAYMENT] Processing payment from {payer.username} to {receiver.username}")
         
-        # Find active debts where payer owes to receiver
-        active_debts = self.db.query(Debt).filter(
-            Debt.debtor_id == payer.id,
-            Debt.creditor_id == receiver.id,
-            Debt.status == DebtStatus.ACTIVE
-        ).order_by(Debt.created_at).all()
-        
-        if not active_debts:
+        try:
+            settlement = await settle_debts(self.db, payer.id, receiver.id, amount, allow_excess=True)
+        except NoActiveDebtsError:
             print(f"[PAYMENT] No active debts found")
             return {
                 "success": False,
@@ -207,82 +259,20 @@ class MessageAnalyzer:
                 "remaining_debts": []
             }
         
-        total_debt = sum(debt.amount for debt in active_debts)
-        print(f"[PAYMENT] Total debt: {total_debt} TL")
-        
-        # If amount not specified, pay all debts
-        if amount is None:
-            amount = total_debt
-        
-        # Track original payment amount
-        original_payment = amount
-        excess_amount = 0
-        
-        # If payment exceeds total debt, create reverse debt
-        if amount > total_debt:
-            excess_amount = amount - total_debt
-            amount = total_debt  # Only pay the debt amount
-            print(f"[PAYMENT] Excess payment detected: {excess_amount} TL - Will create reverse debt")
-        
-        remaining_amount = amount
-        settled_debts = []
-        partially_paid_debt = None
-        
-        # Pay debts starting from oldest
-        for debt in active_debts:
-            if remaining_amount <= 0:
-                break
-            
-            if remaining_amount >= debt.amount:
-                # Fully settle this debt
-                debt.status = DebtStatus.SETTLED
-                debt.settled_at = datetime.utcnow()
-                remaining_amount -= debt.amount
-                settled_debts.append(debt)
-                print(f"[PAYMENT] Debt {debt.id} fully settled: {debt.amount} TL")
-            else:
-                # Partially pay this debt
-                debt.amount -= remaining_amount
-                partially_paid_debt = {
-                    "debt_id": debt.id,
-                    "paid": remaining_amount,
-                    "remaining": debt.amount
-                }
-                remaining_amount = 0
-                print(f"[PAYMENT] Debt {debt.id} partially paid: {partially_paid_debt['paid']} TL, remaining: {partially_paid_debt['remaining']} TL")
-        
-        # Create reverse debt if excess payment exists
-        reverse_debt = None
+        excess_amount = settlement["excess"]
+        original_payment = settlement["paid"] + excess_amount
         if excess_amount > 0:
-            reverse_debt = Debt(
-                debtor_id=receiver.id,  # Receiver now owes to payer
-                creditor_id=payer.id,   # Payer is now creditor
-                amount=excess_amount,
-                status=DebtStatus.ACTIVE
-            )
-            self.db.add(reverse_debt)
             print(f"[PAYMENT] Reverse debt created: {receiver.username} owes {payer.username} {excess_amount} TL")
         
-        self.db.commit()
-        
-        # Calculate remaining total debt
-        remaining_total = sum(
-            debt.amount for debt in self.db.query(Debt).filter(
-                Debt.debtor_id == payer.id,
-                Debt.creditor_id == receiver.id,
-                Debt.status == DebtStatus.ACTIVE
-            ).all()
-        )
-        
         result = {
             "success": True,
             "paid_amount": original_payment,
-            "debt_paid": amount,
+            "debt_paid": settlement["paid"],
             "excess_amount": excess_amount,
-            "reverse_debt_created": reverse_debt is not None,
-            "settled_count": len(settled_debts),
-            "partially_paid": partially_paid_debt,
-            "remaining_total_debt": remaining_total,
+            "reverse_debt_created": settlement["reverse_debt_id"] is not None,
+            "settled_count": len(settlement["settled_debt_ids"]) - (1 if settlement["partially_paid"] else 0),
+            "partially_paid": settlement["partially_paid"],
+            "remaining_total_debt": settlement["remaining_debt"],
             "message": f"{original_payment} TL ödeme yapıldı" + (f" ({excess_amount} TL fazla ödeme - ters borç oluşturuldu)" if excess_amount > 0 else "")
         }
         
@@ -290,35 +280,13 @@ class MessageAnalyzer:
         return result
     
     @staticmethod
-    def calculate_net_balance(db: Session, user1_id: int, user2_id: int) -> Dict[str, float]:
+    async def calculate_net_balance(db: AsyncSession, user1_id: int, user2_id: int) -> Dict[str, float]:
         """
         Calculate net balance between two users
         
+        Reads the maintained balance row instead of summing debts.
+        
         Returns:
-            dict: Net balance information
+            dict: Net balance information (net_balance is positive if user1 should receive)
         """
-        # User1 owes to User2
-        user1_owes = db.query(Debt).filter(
-            Debt.debtor_id == user1_id,
-            Debt.creditor_id == user2_id,
-            Debt.status == DebtStatus.ACTIVE
-        ).all()
-        
-        # User2 owes to User1
-        user2_owes = db.query(Debt).filter(
-            Debt.debtor_id == user2_id,
-            Debt.creditor_id == user1_id,
-            Debt.status == DebtStatus.ACTIVE
-        ).all()
-        
-        user1_total_owed = sum(debt.amount for debt in user1_owes)
-        user2_total_owed = sum(debt.amount for debt in user2_owes)
-        
-        # Net balance (positive = user1 should receive, negative = user1 should pay)
-        net_balance = user2_total_owed - user1_total_owed
-        
-        return {
-            "user1_owes": user1_total_owed,
-            "user2_owes": user2_total_owed,
-            "net_balance": net_balance
-        }
+        return await get_pair_balance(db, user1_id, user2_id)
@@ -0,0 +1,129 @@
+import asyncio
+from typing import Dict, List, Optional, Set, Tuple
+from app.config import settings
+from app.ai.gemini import GeminiClient, GeminiError, FALLBACK_ANALYSIS
+
+
+class GeminiBatcher:
+    """
+    Collects concurrent analysis requests into a single Gemini call
+
+    The first request opens a batch; the batch is sent after window_ms or
+    as soon as it holds max_size messages, whichever comes first. Each
+    caller awaits its own future and gets back its own analysis.
+    """
+
+    def __init__(
+        self,
+        window_ms: int = settings.GEMINI_BATCH_WINDOW_MS,
+        max_size: int = settings.GEMINI_BATCH_MAX_SIZE
+    ):
+        self.window_ms = window_ms
+        self.max_size = max_size
+        self._items: List[Tuple[str, str, str]] = []
+        self._futures: List[asyncio.Future] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._sends: Set[asyncio.Task] = set()  # Batches in flight; the loop only keeps weak references
+        self.stats: Dict[str, int] = {"requests": 0, "batches": 0, "failed_batches": 0}
+
+    async def analyze(
+        self,
+        message: str,
+        sender_username: str,
+        receiver_username: str,
+        raise_on_error: bool = False
+    ) -> dict:
+        """
+        Analyze a message as part of the current batch
+
+        Args:
+            raise_on_error: Raise GeminiError instead of falling back to "normal"
+        """
+        if self.max_size <= 1:
+            return await GeminiClient.analyze_message_async(
+                message, sender_username, receiver_username, raise_on_error=raise_on_error
+            )
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._items.append((message, sender_username, receiver_username))
+        self._futures.append(future)
+        self.stats["requests"] += 1
+
+        if len(self._items) >= self.max_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window_ms / 1000, self._flush)
+
+        try:
+            return await future
+        except GeminiError:
+            if raise_on_error:
+                raise
+            return dict(FALLBACK_ANALYSIS)
+
+    async def stop(self):
+        """Cancel the open batch and the ones in flight; their callers get GeminiError"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        futures = self._futures
+        self._items, self._futures = [], []
+        for future in futures:
+            if not future.done():
+                future.set_exception(GeminiError("Batcher stopped"))
+
+        for task in self._sends:
+            task.cancel()
+        await asyncio.gather(*self._sends, return_exceptions=True)
+
+    def average_batch_size(self) -> float:
+        """Average number of messages sent per Gemini request"""
+        return self.stats["requests"] / self.stats["batches"] if self.stats["batches"] else 0.0
+
+    def _flush(self):
+        """Hand the collected batch to a background task and start a new one"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        items, futures = self._items, self._futures
+        self._items, self._futures = [], []
+        if items:
+            task = asyncio.create_task(self._send(items, futures))
+            self._sends.add(task)
+            task.add_done_callback(self._sends.discard)
+
+    async def _send(self, items: List[Tuple[str, str, str]], futures: List[asyncio.Future]):
+        """Send one batch and resolve every waiting future"""
+        self.stats["batches"] += 1
+        try:
+            try:
+                if len(items) == 1:
+                    analyses = [await GeminiClient.analyze_message_async(*items[0], raise_on_error=True)]
+                else:
+                    analyses = await GeminiClient.analyze_messages_batch_async(items)
+            except GeminiError as e:
+                self.stats["failed_batches"] += 1
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(GeminiError(str(e)))
+                return
+
+            for future, analysis in zip(futures, analyses):
+                if future.done():
+                    continue
+                if isinstance(analysis, dict) and "type" in analysis:
+                    future.set_result(analysis)
+                else:
+                    future.set_exception(GeminiError(f"Invalid analysis in batch: {analysis!r}"))
+        finally:
+            # Cancelled or failed unexpectedly: nobody may be left waiting
+            for future in futures:
+                if not future.done():
+                    future.set_exception(GeminiError("Batch was not sent"))
+
+
+# Global batcher instance
+gemini_batcher = GeminiBatcher()
@@ -0,0 +1,126 @@
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.models import AnalysisCacheEntry
+from app.ai.text import normalize_message
+
+# Longer messages are rarely repeated and would bloat the key column
+MAX_KEY_LENGTH = 200
+
+
+class AnalysisCache:
+    """
+    LRU + TTL cache of analysis results keyed by normalized message text
+
+    Entries live in memory (bounded by max_size) and, when persist is
+    enabled, in the analysis_cache table so they survive restarts.
+    """
+
+    def __init__(
+        self,
+        max_size: int = settings.ANALYSIS_CACHE_SIZE,
+        ttl_seconds: int = settings.ANALYSIS_CACHE_TTL_SECONDS,
+        persist: bool = settings.ANALYSIS_CACHE_PERSIST
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.persist = persist
+        self._entries: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "db_hits": 0}
+
+    @staticmethod
+    def make_key(message: str) -> Optional[str]:
+        """Cache key for a message, or None if it should not be cached"""
+        key = normalize_message(message)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return None
+        return key
+
+    async def get(self, message: str, db: Optional[AsyncSession] = None) -> Optional[dict]:
+        """Look up a cached analysis"""
+        key = self.make_key(message)
+        if key is None:
+            return None
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            result, expires_at = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return dict(result)
+            del self._entries[key]
+
+        if self.persist and db is not None:
+            min_created_at = datetime.now(timezone.utc) - timedelta(seconds=self.ttl_seconds)
+            rows = await db.execute(select(AnalysisCacheEntry).where(
+                AnalysisCacheEntry.key == key,
+                AnalysisCacheEntry.created_at >= min_created_at
+            ))
+            row = rows.scalar_one_or_none()
+            if row is not None:
+                self._store(key, row.result)
+                self.stats["hits"] += 1
+                self.stats["db_hits"] += 1
+                return dict(row.result)
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, message: str, result: dict, db: Optional[AsyncSession] = None):
+        """
+        Cache an analysis result
+
+        The database row is upserted in a savepoint of the given session, so
+        workers caching the same key concurrently cannot fail the caller's
+        transaction; the caller commits.
+        """
+        key = self.make_key(message)
+        if key is None:
+            return
+
+        self._store(key, result)
+
+        if self.persist and db is not None:
+            insert = pg_insert if db.bind.dialect.name == "postgresql" else sqlite_insert
+            statement = insert(AnalysisCacheEntry).values(
+                key=key,
+                result=result,
+                created_at=datetime.now(timezone.utc)
+            )
+            statement = statement.on_conflict_do_update(
+                index_elements=[AnalysisCacheEntry.key],
+                set_={"result": statement.excluded.result, "created_at": statement.excluded.created_at}
+            )
+            try:
+                async with db.begin_nested():
+                    await db.execute(statement)
+            except SQLAlchemyError as e:
+                # Losing a cache row only costs a future Gemini call
+                print(f"[CACHE] Could not persist analysis for {key!r}: {e}")
+
+    def hit_rate(self) -> float:
+        """Fraction of lookups answered from the cache"""
+        total = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / total if total else 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _store(self, key: str, result: dict):
+        """Insert into the in-memory LRU, evicting the oldest entry if full"""
+        self._entries[key] = (dict(result), time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+# Global analysis cache instance
+analysis_cache = AnalysisCache()
@@ -1,32 +1,19 @@
-import google.generativeai as genai
 from app.config import settings
+import asyncio
 import json
-from typing import Optional
+from typing import List, Optional, Tuple
 
-# Configure Gemini API
-genai.configure(api_key=settings.GOOGLE_API_KEY)
+# Gemini model, configured on first use (see get_model)
+_model = None
 
-# Initialize the model (using gemini-2.5-flash - latest fast model)
-model = genai.GenerativeModel('gemini-2.5-flash')
+# Caps the number of in-flight Gemini requests on this worker
+_request_semaphore = asyncio.Semaphore(settings.GEMINI_MAX_CONCURRENCY)
 
+# Result used when the API call fails or returns invalid JSON
+FALLBACK_ANALYSIS = {"type": "normal", "item": None, "amount": None, "confidence": 0.0}
 
-class GeminiClient:
-    """Google Gemini AI client"""
-    
-    @staticmethod
-    def analyze_message(message: str, sender_username: str, receiver_username: str) -> dict:
-        """
-        Analyze a message to determine if it's a task, expense, payment, or normal message
-        
-        Args:
-            message: The message content to analyze.
-            sender_username: The username of the sender.
-            receiver_username: The username of the receiver.
-        
-        Returns:
-            dict: A dictionary containing the analysis result (type, item, amount, confidence).
-        """
-        prompt = f"""
+
+_CATEGORIES = """
         Analyze the user message and categorize it into one of the following types:
         1. TASK: Something that needs to be acquired or done (future tense, implies an action).
         2. EXPENSE: Something was acquired or done, and a cost is mentioned (past tense, implies a transaction).
@@ -34,59 +21,203 @@ class GeminiClient:
         4. NORMAL: A regular conversational message.
 
         Consider the context of a two-person household or shared expense scenario.
-        
-        Sender: {sender_username}
-        Receiver: {receiver_username}
-        Message: "{message}"
+        """
 
-        Return the analysis in JSON format. Ensure the JSON is valid and contains only the specified fields.
-        
+_EXAMPLES = """
         Example for TASK:
         Message: "mop alınacak"
-        Output: {{"type": "task", "item": "mop", "amount": null, "confidence": 0.95}}
+        Output: {"type": "task", "item": "mop", "amount": null, "confidence": 0.95}
         
         Example for EXPENSE:
         Message: "mop aldım 300tl"
-        Output: {{"type": "expense", "item": "mop", "amount": 300, "confidence": 0.98}}
+        Output: {"type": "expense", "item": "mop", "amount": 300, "confidence": 0.98}
         
         Example for PAYMENT:
         Message: "200 TL ödedim"
-        Output: {{"type": "payment", "item": null, "amount": 200, "confidence": 0.95}}
+        Output: {"type": "payment", "item": null, "amount": 200, "confidence": 0.95}
         
         Example for PAYMENT (full debt):
         Message: "borcumu kapattım"
-        Output: {{"type": "payment", "item": null, "amount": null, "confidence": 0.90}}
+        Output: {"type": "payment", "item": null, "amount": null, "confidence": 0.90}
         
         Example for NORMAL:
         Message: "Merhaba nasılsın?"
-        Output: {{"type": "normal", "item": null, "amount": null, "confidence": 1.0}}
+        Output: {"type": "normal", "item": null, "amount": null, "confidence": 1.0}
         
         If an item or amount cannot be clearly extracted for TASK, EXPENSE, or PAYMENT, set them to null.
         For PAYMENT type, if no amount is specified, set amount to null (means pay all debts).
         Confidence should be a float between 0 and 1.
         """
+
+
+class GeminiError(Exception):
+    """Raised when a Gemini analysis could not be obtained"""
+
+
+def get_model():
+    """
+    Gemini model (gemini-2.5-flash), created on first use
+    
+    The SDK takes about half a second to import, so it is loaded here rather
+    than when the app starts. Raises GeminiError without GOOGLE_API_KEY.
+    """
+    global _model
+    if _model is None:
+        if not settings.GOOGLE_API_KEY:
+            raise GeminiError("GOOGLE_API_KEY is not set")
+        import google.generativeai as genai
+        genai.configure(api_key=settings.GOOGLE_API_KEY)
+        _model = genai.GenerativeModel('gemini-2.5-flash')
+    return _model
+
+
+class GeminiClient:
+    """Google Gemini AI client"""
+    
+    @staticmethod
+    def _build_prompt(message: str, sender_username: str, receiver_username: str) -> str:
+        """Build the classification prompt for a single message"""
+        return f"""{_CATEGORIES}
+        Sender: {sender_username}
+        Receiver: {receiver_username}
+        Message: "{message}"
+
+        Return the analysis in JSON format. Ensure the JSON is valid and contains only the specified fields.
+        {_EXAMPLES}"""
+    
+    @staticmethod
+    def _build_batch_prompt(items: List[Tuple[str, str, str]]) -> str:
+        """Build one classification prompt for several (message, sender, receiver) items"""
+        numbered = "\n".join(
+            f'        {i}. Sender: {sender} | Receiver: {receiver} | Message: "{message}"'
+            for i, (message, sender, receiver) in enumerate(items, start=1)
+        )
+        return f"""{_CATEGORIES}
+        Messages:
+{numbered}
+
+        Return a JSON array with exactly {len(items)} analysis objects, one per message, in the same order.
+        Ensure the JSON is valid and each object contains only the specified fields.
+        {_EXAMPLES}"""
+    
+    @staticmethod
+    def _parse_response(analysis_text: str) -> dict:
+        """Parse the model output, handling potential markdown formatting"""
+        analysis_text = analysis_text.strip()
+        if analysis_text.startswith("```json"):
+            analysis_text = analysis_text[7:]
+        if analysis_text.endswith("```"):
+            analysis_text = analysis_text[:-3]
+        
+        return json.loads(analysis_text)
+    
+    @staticmethod
+    def analyze_message(message: str, sender_username: str, receiver_username: str) -> dict:
+        """
+        Analyze a message to determine if it's a task, expense, payment, or normal message
+        
+        Blocks the calling thread; use analyze_message_async from async code.
+        
+        Args:
+            message: The message content to analyze.
+            sender_username: The username of the sender.
+            receiver_username: The username of the receiver.
+        
+        Returns:
+            dict: A dictionary containing the analysis result (type, item, amount, confidence).
+        """
+        prompt = GeminiClient._build_prompt(message, sender_username, receiver_username)
         
         print(f"[GEMINI] Sending to API: {message}")
         
         try:
-            response = model.generate_content(prompt)
-            # Assuming the response is directly parsable JSON
-            analysis_text = response.text.strip()
-            print(f"[GEMINI] API response: {analysis_text}")
-            
-            # Attempt to parse JSON, handle potential markdown formatting
-            if analysis_text.startswith("```json"):
-                analysis_text = analysis_text[7:]
-            if analysis_text.endswith("```"):
-                analysis_text = analysis_text[:-3]
+            response = get_model().generate_content(prompt)
+            print(f"[GEMINI] API response: {response.text.strip()}")
             
-            analysis = json.loads(analysis_text)
+            analysis = GeminiClient._parse_response(response.text)
             print(f"[GEMINI] Successfully parsed analysis: {analysis}")
             return analysis
         except Exception as e:
             print(f"[GEMINI ERROR] Exception: {e}")
-            print(f"[GEMINI ERROR] Falling back to normal")
+            print("[GEMINI ERROR] Falling back to normal")
             import traceback
             traceback.print_exc()
             # Fallback for API errors or invalid JSON
-            return {"type": "normal", "item": None, "amount": None, "confidence": 0.0}
+            return dict(FALLBACK_ANALYSIS)
+    
+    @staticmethod
+    async def analyze_message_async(
+        message: str,
+        sender_username: str,
+        receiver_username: str,
+        raise_on_error: bool = False
+    ) -> dict:
+        """
+        Analyze a message without blocking the event loop
+        
+        Uses the native async Gemini client. At most GEMINI_MAX_CONCURRENCY
+        requests are in flight per worker; further callers wait their turn.
+        
+        Args:
+            raise_on_error: Raise GeminiError instead of falling back to "normal"
+        
+        Returns:
+            dict: A dictionary containing the analysis result (type, item, amount, confidence).
+        """
+        prompt = GeminiClient._build_prompt(message, sender_username, receiver_username)
+        
+        print(f"[GEMINI] Sending to API (async): {message}")
+        
+        try:
+            async with _request_semaphore:
+                response = await asyncio.wait_for(
+                    get_model().generate_content_async(prompt),
+                    timeout=settings.GEMINI_TIMEOUT_SECONDS
+                )
+            print(f"[GEMINI] API response: {response.text.strip()}")
+            
+            analysis = GeminiClient._parse_response(response.text)
+            print(f"[GEMINI] Successfully parsed analysis: {analysis}")
+            return analysis
+        except Exception as e:
+            print(f"[GEMINI ERROR] Exception: {e!r}")
+            if raise_on_error:
+                raise GeminiError(str(e)) from e
+            print("[GEMINI ERROR] Falling back to normal")
+            # Fallback for API errors, timeouts or invalid JSON
+            return dict(FALLBACK_ANALYSIS)
+    
+    @staticmethod
+    async def analyze_messages_batch_async(items: List[Tuple[str, str, str]]) -> List[dict]:
+        """
+        Analyze several messages with a single Gemini request
+        
+        Args:
+            items: (message, sender_username, receiver_username) tuples
+        
+        Returns:
+            list: One analysis dict per item, in the same order
+        
+        Raises:
+            GeminiError: If the request fails or the response does not match the batch
+        """
+        prompt = GeminiClient._build_batch_prompt(items)
+        
+        print(f"[GEMINI] Sending batch of {len(items)} messages to API")
+        
+        try:
+            async with _request_semaphore:
+                response = await asyncio.wait_for(
+                    get_model().generate_content_async(prompt),
+                    timeout=settings.GEMINI_TIMEOUT_SECONDS
+                )
+            analyses = GeminiClient._parse_response(response.text)
+        except Exception as e:
+            print(f"[GEMINI ERROR] Batch exception: {e!r}")
+            raise GeminiError(str(e)) from e
+        
+        if not isinstance(analyses, list) or len(analyses) != len(items):
+            raise GeminiError(f"Expected {len(items)} analyses, got: {response.text.strip()[:200]}")
+        
+        print(f"[GEMINI] Successfully parsed batch of {len(analyses)} analyses")
+        return analyses
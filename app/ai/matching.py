@@ -0,0 +1,86 @@
+from typing import Optional, Set
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.models import Task, TaskStatus
+from app.ai.text import item_key
+
+
+def trigrams(key: str) -> Set[str]:
+    """Character trigrams of each word, padded the way pg_trgm does"""
+    grams = set()
+    for word in key.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(key1: str, key2: str) -> float:
+    """Share of trigrams two item keys have in common (1.0 means identical)"""
+    grams1, grams2 = trigrams(key1), trigrams(key2)
+    if not grams1 or not grams2:
+        return 0.0
+    return len(grams1 & grams2) / len(grams1 | grams2)
+
+
+def match_score(key: str, task_key: str) -> float:
+    """
+    How well an expense item key matches a task item key
+
+    Compares against the whole task key and against every run of the same
+    number of words in it, so "salça" fully matches "domates salçası".
+    """
+    words, task_words = key.split(), task_key.split()
+    width = len(words)
+    windows = [" ".join(task_words[i:i + width]) for i in range(max(len(task_words) - width + 1, 1))]
+    return max(similarity(key, window) for window in windows)
+
+
+async def find_open_task(
+    db: AsyncSession,
+    item_name: str,
+    user1_id: int,
+    user2_id: int,
+    min_similarity: float = settings.TASK_MATCH_MIN_SIMILARITY
+) -> Optional[Task]:
+    """
+    Best matching pending or in-progress task between two users
+
+    Only the ids and item keys of the pair's open tasks are loaded (an
+    indexed lookup, usually a handful of rows); they are scored in memory
+    by trigram similarity of stemmed item keys, so "ekmeği" matches
+    "ekmek" and "süt" matches "sut". Equal scores go to the oldest task.
+
+    Returns:
+        Task or None if no task is similar enough
+    """
+    key = item_key(item_name)
+    if not key:
+        return None
+
+    rows = await db.execute(
+        select(Task.id, Task.item_key, Task.item_name)
+        .where(
+            Task.status.in_([TaskStatus.PENDING, TaskStatus.IN_PROGRESS]),
+            or_(
+                and_(Task.created_by == user1_id, Task.assigned_to == user2_id),
+                and_(Task.created_by == user2_id, Task.assigned_to == user1_id)
+            )
+        )
+        .order_by(Task.created_at, Task.id)
+    )
+
+    # Best word-level match wins; the whole-key similarity breaks ties
+    # ("süt" prefers a "süt" task over "süt tozu")
+    best_id, best_score = None, (0.0, 0.0)
+    for task_id, task_key, task_name in rows.all():
+        # Tasks created before item_key existed are keyed on the fly
+        if task_key is None:
+            task_key = item_key(task_name)
+        score = (match_score(key, task_key), similarity(key, task_key))
+        if score > best_score:
+            best_id, best_score = task_id, score
+
+    if best_id is None or best_score[0] < min_similarity:
+        return None
+    return await db.get(Task, best_id)
@@ -0,0 +1,300 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import Message, User
+from app.ai.analyzer import MessageAnalyzer
+from app.ai.gemini import FALLBACK_ANALYSIS
+
+# Called with (message_id, analysis_result, sender, receiver) after a job succeeds
+ResultHandler = Callable[[int, dict, User, User], Awaitable[None]]
+
+
+class AnalysisQueue:
+    """
+    In-process job queue for message analysis
+
+    Messages are stored with ai_analysis = NULL and only their id is queued.
+    A NULL analysis is the durable "pending" marker: it is only set, in the
+    same transaction as the tasks, debts and payments it causes, once all of
+    them are written. Jobs that are dropped because the queue is full, fail
+    unexpectedly, or are lost on shutdown are picked up again by the
+    periodic sweep (which also runs on startup).
+
+    Every worker on every node claims a message before analyzing it, with a
+    conditional UPDATE that counts the attempt and sets a lease
+    (analysis_claimed_until). Other workers and sweeps skip claimed
+    messages until the lease runs out. A message that fails max_retries + 1
+    attempts gets FALLBACK_ANALYSIS, so it stops being pending.
+    """
+
+    def __init__(
+        self,
+        workers: int = settings.ANALYSIS_WORKERS,
+        capacity: int = settings.ANALYSIS_QUEUE_SIZE,
+        max_retries: int = settings.ANALYSIS_MAX_RETRIES,
+        sweep_interval: float = settings.ANALYSIS_SWEEP_INTERVAL_SECONDS,
+        claim_seconds: float = settings.ANALYSIS_CLAIM_SECONDS
+    ):
+        self.workers = workers
+        self.capacity = capacity
+        self.max_retries = max_retries
+        self.sweep_interval = sweep_interval
+        self.claim_seconds = claim_seconds
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._pending: Set[int] = set()  # Queued, running or waiting for a retry
+        self._result_handler: Optional[ResultHandler] = None
+        self.stats: Dict[str, int] = {
+            "enqueued": 0,
+            "processed": 0,
+            "retried": 0,
+            "failed": 0,
+            "errors": 0,
+            "skipped": 0,
+            "dropped": 0,
+            "recovered": 0
+        }
+
+    async def start(self, result_handler: Optional[ResultHandler] = None):
+        """Start the worker pool and the pending-message sweeper"""
+        self._result_handler = result_handler
+        self._queue = asyncio.Queue(maxsize=self.capacity)
+
+        for i in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(i)))
+        self._tasks.append(asyncio.create_task(self._sweeper()))
+
+        print(f"[QUEUE] Started {self.workers} analysis workers (capacity {self.capacity})")
+
+    async def stop(self):
+        """Stop all workers; unfinished jobs stay pending in the database"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._pending.clear()
+
+    def enqueue(self, message_id: int) -> bool:
+        """
+        Queue a message for analysis without waiting
+
+        Returns:
+            bool: False if the queue is full; the message then stays pending
+                until the next sweep
+        """
+        if self._queue is None:
+            return False
+
+        if message_id in self._pending:
+            return True
+
+        try:
+            self._queue.put_nowait(message_id)
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            print(f"[QUEUE] Queue full, message {message_id} left pending")
+            return False
+
+        self._pending.add(message_id)
+        self.stats["enqueued"] += 1
+        return True
+
+    def queue_size(self) -> int:
+        """Number of jobs waiting for a worker"""
+        return self._queue.qsize() if self._queue else 0
+
+    async def _worker(self, worker_id: int):
+        """Take jobs off the queue until cancelled"""
+        while True:
+            message_id = await self._queue.get()
+            try:
+                await self._process(message_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Nothing was stored; once the claim runs out the sweep picks the message up again
+                self._pending.discard(message_id)
+                self.stats["errors"] += 1
+                print(f"[QUEUE] Worker {worker_id} error on message {message_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _process(self, message_id: int):
+        """Claim, analyze and store one message in its own database session"""
+        async with AsyncSessionLocal() as db:
+            attempt = await self._claim(db, message_id)
+            if attempt is None:
+                # Already analyzed, or another worker holds it
+                self._pending.discard(message_id)
+                self.stats["skipped"] += 1
+                return
+
+            if attempt > self.max_retries + 1:
+                # Earlier attempts ended without releasing the claim (crash or shutdown)
+                await self._give_up(db, message_id, attempt - 1)
+                return
+
+            message = await db.get(Message, message_id)
+            sender = await db.get(User, message.sender_id)
+            receiver = await db.get(User, message.receiver_id)
+
+            analyzer = MessageAnalyzer(db)
+            try:
+                analysis = await analyzer.classify(message, sender, receiver, raise_on_error=True)
+                # Ends the read transaction (storing any new cache entry), so no
+                # lock is held while waiting for Gemini
+                await db.commit()
+
+                if not await self._lock_pending(db, message_id):
+                    await db.rollback()
+                    self._pending.discard(message_id)
+                    self.stats["skipped"] += 1
+                    return
+
+                analysis_result = await analyzer.apply(message, sender, receiver, analysis)
+                message.analysis_claimed_until = None
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                print(f"[QUEUE] Attempt {attempt} on message {message_id} failed: {e!r}")
+                await self._schedule_retry(db, message_id, attempt)
+                return
+
+            self._pending.discard(message_id)
+            self.stats["processed"] += 1
+
+            if self._result_handler:
+                await self._result_handler(message_id, analysis_result, sender, receiver)
+
+    async def _claim(self, db: AsyncSession, message_id: int) -> Optional[int]:
+        """
+        Take the lease on a pending message and count the attempt
+
+        Returns:
+            int: The attempt number, or None if the message is analyzed,
+                gone, or claimed by another worker
+        """
+        now = datetime.now(timezone.utc)
+        result = await db.execute(
+            update(Message)
+            .where(
+                Message.id == message_id,
+                Message.ai_analysis.is_(None),
+                or_(Message.analysis_claimed_until.is_(None), Message.analysis_claimed_until <= now)
+            )
+            .values(
+                analysis_attempts=Message.analysis_attempts + 1,
+                analysis_claimed_until=now + timedelta(seconds=self.claim_seconds)
+            )
+            .returning(Message.analysis_attempts)
+            .execution_options(synchronize_session=False)
+        )
+        attempt = result.scalar_one_or_none()
+        await db.commit()
+        return attempt
+
+    @staticmethod
+    async def _lock_pending(db: AsyncSession, message_id: int) -> bool:
+        """Lock the message row until commit; False if it was analyzed meanwhile"""
+        result = await db.execute(
+            select(Message.id)
+            .where(Message.id == message_id, Message.ai_analysis.is_(None))
+            .with_for_update()
+        )
+        return result.scalar_one_or_none() is not None
+
+    async def _schedule_retry(self, db: AsyncSession, message_id: int, attempt: int):
+        """Re-queue a failed job with exponential backoff, or give up after max_retries"""
+        if attempt > self.max_retries:
+            await self._give_up(db, message_id, attempt)
+            return
+
+        delay = min(
+            settings.ANALYSIS_RETRY_BASE_DELAY * (2 ** (attempt - 1)),
+            settings.ANALYSIS_RETRY_MAX_DELAY
+        )
+        # The claim now runs until the retry is due, so no other worker takes it earlier
+        await db.execute(
+            update(Message)
+            .where(Message.id == message_id, Message.ai_analysis.is_(None))
+            .values(analysis_claimed_until=datetime.now(timezone.utc) + timedelta(seconds=delay))
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+
+        self.stats["retried"] += 1
+        print(f"[QUEUE] Retrying message {message_id} in {delay:.1f}s (attempt {attempt + 1})")
+        self._tasks.append(asyncio.create_task(self._retry_later(message_id, delay)))
+
+    async def _give_up(self, db: AsyncSession, message_id: int, attempts: int):
+        """Store FALLBACK_ANALYSIS so the message is no longer pending, and report it"""
+        self._pending.discard(message_id)
+        self.stats["failed"] += 1
+        print(f"[QUEUE] Message {message_id} failed {attempts} times, storing fallback analysis")
+
+        analysis = dict(FALLBACK_ANALYSIS)
+        result = await db.execute(
+            update(Message)
+            .where(Message.id == message_id, Message.ai_analysis.is_(None))
+            .values(ai_analysis=analysis, analysis_claimed_until=None)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        if result.rowcount != 1 or not self._result_handler:
+            return
+
+        message = await db.get(Message, message_id)
+        sender = await db.get(User, message.sender_id)
+        receiver = await db.get(User, message.receiver_id)
+        analysis_result = {"analysis": analysis, "task": None, "expense": None, "debt": None, "payment": None}
+        await self._result_handler(message_id, analysis_result, sender, receiver)
+
+    async def _retry_later(self, message_id: int, delay: float):
+        """Wait out the backoff delay and put the job back on the queue"""
+        await asyncio.sleep(delay)
+        self._tasks.remove(asyncio.current_task())
+        self._pending.discard(message_id)
+        self.enqueue(message_id)
+
+    async def _sweeper(self):
+        """Queue messages that are still pending in the database"""
+        while True:
+            try:
+                await self._sweep()
+            except Exception as e:
+                print(f"[QUEUE] Sweep error: {e}")
+            await asyncio.sleep(self.sweep_interval)
+
+    async def _sweep(self):
+        """Queue as many pending messages as there is free capacity for"""
+        free = self.capacity - self.queue_size()
+        if free <= 0:
+            return
+
+        now = datetime.now(timezone.utc)
+        query = select(Message.id).where(
+            Message.ai_analysis.is_(None),
+            or_(Message.analysis_claimed_until.is_(None), Message.analysis_claimed_until <= now)
+        )
+        if self._pending:
+            query = query.where(Message.id.notin_(self._pending))
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(query.order_by(Message.id).limit(free))
+            pending_ids = result.scalars().all()
+
+        for message_id in pending_ids:
+            if self.enqueue(message_id):
+                self.stats["recovered"] += 1
+
+        if pending_ids:
+            print(f"[QUEUE] Recovered {len(pending_ids)} pending messages")
+
+
+# Global analysis queue instance
+analysis_queue = AnalysisQueue()
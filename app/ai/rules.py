@@ -0,0 +1,126 @@
+import re
+from typing import Dict, Optional
+from app.ai.text import clean_text, parse_amount
+
+# Amount followed by a currency: "300tl", "300 TL", "49,90 lira", "1.500₺"
+_AMOUNT = r"(?P<amount>\d+(?:[.,]\d+)*)\s*(?:tl|₺|lira)(?:'?(?:ye|ya|e|a|yi|yı|i|ı))?"
+# A short item name: up to four words without digits
+_ITEM = r"(?P<item>[^\W\d]+(?:\s+[^\W\d]+){0,3})"
+
+_BOUGHT = r"(?:aldım|aldık|aldim|aldik|satın aldım)"
+_PAID = r"(?:ödedim|ödedik|gönderdim|yolladım|attım|verdim)"
+
+_TASK_RE = re.compile(
+    rf"^{_ITEM}\s+(?:alınacak|alınması lazım|almak lazım|almalıyız|almamız lazım|alınmalı)$"
+)
+_EXPENSE_RES = [
+    re.compile(rf"^{_ITEM}\s+{_BOUGHT}\s+{_AMOUNT}$"),   # "mop aldım 300tl"
+    re.compile(rf"^{_ITEM}\s+{_AMOUNT}\s+{_BOUGHT}$"),   # "mop 300 tl aldım"
+    re.compile(rf"^{_AMOUNT}\s+{_ITEM}\s+{_BOUGHT}$"),   # "300 tl'ye mop aldım"
+]
+_PAYMENT_RE = re.compile(
+    rf"^(?:sana\s+|borcumdan\s+|borç olarak\s+)?{_AMOUNT}\s+{_PAID}$"  # "200 TL ödedim"
+)
+_FULL_PAYMENT_RE = re.compile(
+    r"^(?:tüm\s+|bütün\s+)?(?:borcumu|borçlarımı|borcumun tamamını|borcu)\s+(?:kapattım|ödedim|sıfırladım|bitirdim)$"
+)
+
+# Messages made up only of these words are ordinary conversation
+_SMALL_TALK_WORDS = {
+    "merhaba", "selam", "slm", "mrb", "nasılsın", "naber", "nbr", "iyiyim", "sen",
+    "günaydın", "iyi", "akşamlar", "geceler", "günler", "tamam", "tmm", "ok", "okey",
+    "teşekkürler", "teşekkür", "ederim", "sağol", "sağ", "ol", "eyvallah", "görüşürüz",
+    "hoşçakal", "evet", "hayır", "olur", "peki", "kanka", "abi", "canım",
+}
+_WORD_RE = re.compile(r"[^\W\d_]+")
+
+# Questions are never classified by rules: "ne alınacak?", "süt aldın mı"
+_QUESTION_WORDS = {
+    "ne", "neler", "neyi", "neden", "niye", "niçin", "nasıl", "nerede", "nereden", "nereye",
+    "hangi", "hangisi", "kim", "kime", "kimi", "kaç", "kaça", "mı", "mi", "mu", "mü",
+    "mısın", "misin", "musun", "müsün", "mıyız", "miyiz",
+}
+# Words that are not part of an item name: "bence bir şey almalıyız", "dün ... aldım"
+_NON_ITEM_WORDS = {
+    "bir", "şey", "bişey", "birşey", "bişi", "bence", "galiba", "sanırım", "herhalde", "belki",
+    "dün", "bugün", "yarın", "şimdi", "az", "önce", "yine", "gene", "de", "da", "ki", "hep", "hiç",
+    "ben", "sen", "o", "biz", "siz", "onlar", "bu", "şu", "bunu", "şunu", "onu", "bunları",
+    "bana", "sana", "ona", "bize", "size", "ayrıca", "bunlar", "şunlar",
+}
+
+
+def _is_item(item: str) -> bool:
+    """Whether a matched item looks like an item name rather than filler"""
+    return not _NON_ITEM_WORDS.intersection(item.split())
+
+
+class RuleClassifier:
+    """
+    Deterministic classifier for the common message shapes
+
+    Returns the same {type, item, amount, confidence} dict as
+    GeminiClient.analyze_message, or None when the message does not
+    clearly match a rule and should go to Gemini.
+    """
+
+    def __init__(self):
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0}
+
+    def classify(self, message: str) -> Optional[dict]:
+        """Classify a message, or return None if the rules are unsure"""
+        # clean_text drops the trailing "?", so questions are caught on the raw message
+        analysis = None if "?" in message else self._match(clean_text(message))
+
+        if analysis is None:
+            self.stats["misses"] += 1
+        else:
+            self.stats["hits"] += 1
+        return analysis
+
+    def hit_rate(self) -> float:
+        """Fraction of classified messages answered without Gemini"""
+        total = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / total if total else 0.0
+
+    def _match(self, text: str) -> Optional[dict]:
+        """Run the rules against normalized text"""
+        if not text:
+            return None
+        if _QUESTION_WORDS.intersection(_WORD_RE.findall(text)):
+            return None
+
+        match = _TASK_RE.match(text)
+        if match:
+            if not _is_item(match.group("item")):
+                return None
+            return {"type": "task", "item": match.group("item"), "amount": None, "confidence": 0.95}
+
+        for pattern in _EXPENSE_RES:
+            match = pattern.match(text)
+            if match:
+                if not _is_item(match.group("item")):
+                    return None
+                amount = parse_amount(match.group("amount"))
+                if amount is None:
+                    return None
+                return {"type": "expense", "item": match.group("item"), "amount": amount, "confidence": 0.95}
+
+        match = _PAYMENT_RE.match(text)
+        if match:
+            amount = parse_amount(match.group("amount"))
+            if amount is None:
+                return None
+            return {"type": "payment", "item": None, "amount": amount, "confidence": 0.95}
+
+        if _FULL_PAYMENT_RE.match(text):
+            return {"type": "payment", "item": None, "amount": None, "confidence": 0.9}
+
+        words = _WORD_RE.findall(text)
+        if words and len(words) == len(text.split()) and all(word in _SMALL_TALK_WORDS for word in words):
+            return {"type": "normal", "item": None, "amount": None, "confidence": 1.0}
+
+        return None
+
+
+# Global rule classifier instance
+rule_classifier = RuleClassifier()
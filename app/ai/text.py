@@ -0,0 +1,128 @@
+import re
+from typing import Optional
+
+# Python's str.lower() maps "I" to "i"; Turkish maps it to "ı" (and "İ" to "i")
+_TURKISH_UPPER_MAP = str.maketrans({"I": "ı", "İ": "i"})
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION_RE = re.compile(r"[\s.!?,;:]+$")
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+
+
+def turkish_lower(text: str) -> str:
+    """Lowercase text using Turkish dotted/dotless i rules"""
+    return text.translate(_TURKISH_UPPER_MAP).lower()
+
+
+def clean_text(text: str) -> str:
+    """Turkish-lowercase, collapse whitespace and drop trailing punctuation"""
+    text = _WHITESPACE_RE.sub(" ", turkish_lower(text)).strip()
+    return _TRAILING_PUNCTUATION_RE.sub("", text)
+
+
+def parse_amount(text: str) -> Optional[float]:
+    """
+    Parse a Turkish formatted amount ("300", "1.500", "49,90", "1.250,50")
+
+    Returns:
+        float or None if the text is not a number
+    """
+    if "," in text:
+        # Comma is the decimal separator, dots group thousands
+        text = text.replace(".", "").replace(",", ".")
+    elif re.fullmatch(r"\d{1,3}(\.\d{3})+", text):
+        # Dots only group thousands ("1.500")
+        text = text.replace(".", "")
+
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def _canonical_number(match: "re.Match") -> str:
+    """Format a number the same way however it was written ("300,00" -> "300")"""
+    amount = parse_amount(match.group(0))
+    if amount is None:
+        return match.group(0)
+    text = f"{amount:.2f}".rstrip("0").rstrip(".")
+    return f" {text} "
+
+
+def normalize_message(text: str) -> str:
+    """
+    Normalize a message for use as a cache key
+
+    Applies Turkish-aware lowercasing, collapses whitespace, drops trailing
+    punctuation and canonicalizes numbers, so "Mop aldım 300TL!" and
+    "mop aldım  300,00 tl" produce the same key.
+    """
+    text = _NUMBER_RE.sub(_canonical_number, turkish_lower(text))
+    return clean_text(text)
+
+
+# Turkish letters folded to ASCII so "süt" and "sut" match
+_ASCII_FOLD_MAP = str.maketrans("çğıöşüâîû", "cgiosuaiu")
+
+_NON_LETTER_RE = re.compile(r"[^a-z\s]+")
+
+# Common case, possessive and plural suffixes, longest first. Suffixes that
+# start with a buffer consonant (n, s, y) only follow a vowel, and the
+# accusative "nı"/"nu" only follows a possessive ("salçası-nı").
+_SUFFIXES = (
+    "lari", "leri", "lar", "ler", "dan", "den", "tan", "ten",
+    "nin", "nun", "yla", "yle", "la", "le", "da", "de", "ta", "te",
+    "ni", "nu", "si", "su", "yi", "yu", "ya", "ye", "in", "un",
+    "i", "u", "a", "e",
+)
+_VOWELS = set("aeiou")
+
+# Stems keep at least this many letters so short words are left alone
+_MIN_STEM_LENGTH = 3
+
+# Final consonants that soften before a vowel suffix ("ekmek" -> "ekmeği")
+_HARD_CONSONANTS = {"g": "k", "b": "p", "d": "t"}
+
+
+def _strip_suffix(word: str) -> str:
+    """Remove one suffix from the end of word, if any fits"""
+    for suffix in _SUFFIXES:
+        stem = word[:-len(suffix)]
+        if not word.endswith(suffix) or len(stem) < _MIN_STEM_LENGTH:
+            continue
+        if suffix[0] in "nsy" and stem[-1] not in _VOWELS:
+            continue
+        if suffix in ("ni", "nu") and stem[-1] not in "iu":
+            continue
+        return stem
+    return word
+
+
+def _stem(word: str) -> str:
+    """
+    Strip suffixes until none is left and undo consonant softening
+
+    The result is not always a real word ("elma" -> "elm"), but every
+    inflection of the same word reduces to the same stem, which is all
+    matching needs.
+    """
+    while True:
+        stem = _strip_suffix(word)
+        if stem == word:
+            break
+        word = stem
+    if word[-1] in _HARD_CONSONANTS:
+        word = word[:-1] + _HARD_CONSONANTS[word[-1]]
+    return word
+
+
+def item_key(text: str) -> str:
+    """
+    Normalized, lightly stemmed form of an item name for matching
+
+    "Ekmeği", "ekmek" and "EKMEK!" all map to "ekmek"; "süt" and "sut"
+    both map to "sut". Suffix stripping is deliberately conservative: it
+    only has to make inflections of the same item agree.
+    """
+    text = _NON_LETTER_RE.sub(" ", turkish_lower(text).translate(_ASCII_FOLD_MAP))
+    return " ".join(_stem(word) for word in text.split())
@@ -1,33 +1,48 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from sqlalchemy import select, and_, or_, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from app.database import get_db
-from app.models import User, Debt, DebtStatus
-from app.schemas import DebtResponse, DebtBalance, SettleDebtRequest
+from app.models import User, Debt, DebtStatus, ArchivedDebt
+from app.schemas import Page, DebtResponse, DebtBalance, CounterpartyBalance, SettlePlan, SettleDebtRequest
 from app.auth.dependencies import get_current_user
+from app.auth.cache import UserSnapshot
+from app.api.groups import get_group_for_member
 from app.ai.analyzer import MessageAnalyzer
+from app.pagination import paginate
+from app.responses import page_response, response_columns, make_etag, etag_matches, set_etag, not_modified
+from app.versions import DEBTS, get_version
+from app.ledger.balances import get_user_totals, get_counterparty_balances
+from app.ledger.planner import build_settle_plan
+from app.ledger.settlement import settle_debts, NoActiveDebtsError, AmountExceedsDebtError
 
 router = APIRouter(prefix="/api/debts", tags=["Debts"])
 
 
 @router.get("/balance", response_model=DebtBalance)
 async def get_balance(
+    request: Request,
+    response: Response,
     other_user_id: Optional[int] = Query(None, description="Calculate balance with specific user"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
-    """Get debt balance for current user"""
+    """Get debt balance for current user (conditional on ETag, like /history)"""
+    # An unknown user is a 404 whatever the client has cached
+    if other_user_id and not await db.get(User, other_user_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
+    etag = make_etag(request, DEBTS, current_user.id, await get_version(db, DEBTS, current_user.id))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    
     if other_user_id:
         # Balance with specific user
-        balance_data = MessageAnalyzer.calculate_net_balance(db, current_user.id, other_user_id)
-        other_user = db.query(User).filter(User.id == other_user_id).first()
-        
-        if not other_user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found"
-            )
+        balance_data = await MessageAnalyzer.calculate_net_balance(db, current_user.id, other_user_id)
         
         return DebtBalance(
             user_id=current_user.id,
@@ -38,18 +53,9 @@ async def get_balance(
         )
     else:
         # Total balance with all users
-        debts_owed = db.query(Debt).filter(
-            Debt.debtor_id == current_user.id,
-            Debt.status == DebtStatus.ACTIVE
-        ).all()
-        
-        debts_to_collect = db.query(Debt).filter(
-            Debt.creditor_id == current_user.id,
-            Debt.status == DebtStatus.ACTIVE
-        ).all()
-        
-        total_owed = sum(debt.amount for debt in debts_owed)
-        total_to_collect = sum(debt.amount for debt in debts_to_collect)
+        totals = await get_user_totals(db, current_user.id)
+        total_owed = totals["total_owed"]
+        total_to_collect = totals["total_to_collect"]
         net_balance = total_to_collect - total_owed
         
         return DebtBalance(
@@ -61,96 +67,104 @@ async def get_balance(
         )
 
 
-@router.get("/history", response_model=List[DebtResponse])
+@router.get("/balances", response_model=List[CounterpartyBalance])
+async def get_balances(
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user)
+):
+    """Get debt balance with every counterparty in a single query"""
+    return await get_counterparty_balances(db, current_user.id)
+
+
+@router.get("/settle-plan", response_model=SettlePlan)
+async def get_settle_plan(
+    group_id: Optional[int] = Query(None, description="Plan for the members of a group"),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user)
+):
+    """
+    Fewest transfers that settle the balances between the members of a group
+
+    Balances are not group scoped: the plan covers the members' whole
+    balances with each other, private debts included. Without group_id,
+    lists one direct transfer per counterparty of the current user.
+    """
+    if group_id is not None:
+        await get_group_for_member(db, group_id, current_user.id)
+    return await build_settle_plan(db, current_user.id, group_id)
+
+
+@router.get("/history", response_model=Page[DebtResponse])
 async def get_debt_history(
+    request: Request,
     status_filter: Optional[DebtStatus] = Query(None, description="Filter by status"),
-    limit: int = Query(50, le=100),
-    offset: int = Query(0, ge=0),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
-    """Get debt history"""
-    query = db.query(Debt).filter(
+    """
+    Get debt history, newest first (including archived debts)
+    
+    Sends an ETag; with a matching If-None-Match the answer is 304 after
+    a single version lookup.
+    """
+    # Read the version first: a change committed meanwhile can only make the tag stale, never the data
+    etag = make_etag(request, DEBTS, current_user.id, await get_version(db, DEBTS, current_user.id))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    
+    live = select(*response_columns(DebtResponse, Debt)).where(
         or_(
             Debt.debtor_id == current_user.id,
             Debt.creditor_id == current_user.id
         )
     )
+    archived = select(*response_columns(DebtResponse, ArchivedDebt)).where(
+        or_(
+            ArchivedDebt.debtor_id == current_user.id,
+            ArchivedDebt.creditor_id == current_user.id
+        )
+    )
     
     if status_filter:
-        query = query.filter(Debt.status == status_filter)
+        live = live.where(Debt.status == status_filter)
+        archived = archived.where(ArchivedDebt.status == status_filter)
     
-    debts = query.order_by(Debt.created_at.desc()).offset(offset).limit(limit).all()
-    return debts
+    # Settled debts move to debts_archive after compaction; ids are unique across both
+    history = union_all(live, archived).subquery("history")
+    result = await db.execute(paginate(select(history), history.c, cursor, limit))
+    return set_etag(page_response(result.all(), limit), etag)
 
 
 @router.post("/settle", response_model=dict)
 async def settle_debt(
     settle_request: SettleDebtRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
     """Settle debt manually (mark debts as settled)"""
     creditor_id = settle_request.creditor_id
     amount_to_settle = settle_request.amount
     
-    # Get active debts where current user owes to creditor
-    debts = db.query(Debt).filter(
-        Debt.debtor_id == current_user.id,
-        Debt.creditor_id == creditor_id,
-        Debt.status == DebtStatus.ACTIVE
-    ).order_by(Debt.created_at.asc()).all()
-    
-    if not debts:
+    try:
+        settlement = await settle_debts(db, current_user.id, creditor_id, amount_to_settle)
+    except NoActiveDebtsError:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No active debts found with this creditor"
         )
-    
-    total_debt = sum(debt.amount for debt in debts)
-    
-    if amount_to_settle > total_debt:
+    except AmountExceedsDebtError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Amount exceeds total debt ({total_debt} TL)"
+            detail=str(e)
         )
     
-    # Settle debts
-    remaining = amount_to_settle
-    settled_debts = []
-    
-    for debt in debts:
-        if remaining <= 0:
-            break
-        
-        if debt.amount <= remaining:
-            # Fully settle this debt
-            debt.status = DebtStatus.SETTLED
-            remaining -= debt.amount
-            settled_debts.append(debt.id)
-        else:
-            # Partially settle (split the debt)
-            # Create a new settled debt for the paid amount
-            settled_debt = Debt(
-                debtor_id=debt.debtor_id,
-                creditor_id=debt.creditor_id,
-                amount=remaining,
-                status=DebtStatus.SETTLED,
-                created_at=debt.created_at
-            )
-            db.add(settled_debt)
-            
-            # Update original debt amount
-            debt.amount -= remaining
-            settled_debts.append(settled_debt.id)
-            remaining = 0
-    
-    db.commit()
+    await db.commit()
     
     return {
         "message": "Debt settled successfully",
         "settled_amount": amount_to_settle,
-        "settled_debt_ids": settled_debts,
-        "remaining_debt": total_debt - amount_to_settle
+        "settled_debt_ids": settlement["settled_debt_ids"],
+        "remaining_debt": settlement["remaining_debt"]
     }
-
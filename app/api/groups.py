@@ -0,0 +1,195 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List
+from collections import defaultdict
+from datetime import datetime
+from app.database import get_db
+from app.models import User, Group, GroupMember, Task, TaskStatus, Expense
+from app.schemas import GroupCreate, GroupResponse, GroupExpenseCreate, GroupExpenseResponse
+from app.auth.dependencies import get_current_user
+from app.auth.cache import UserSnapshot
+from app.ledger.splits import split_equally, validate_shares, add_expense_debts, InvalidSplitError
+
+router = APIRouter(prefix="/api/groups", tags=["Groups"])
+
+
+async def get_member_ids(db: AsyncSession, group_id: int) -> List[int]:
+    """Ids of all members of a group"""
+    result = await db.execute(
+        select(GroupMember.user_id).where(GroupMember.group_id == group_id).order_by(GroupMember.user_id)
+    )
+    return list(result.scalars().all())
+
+
+async def get_group_for_member(db: AsyncSession, group_id: int, user_id: int) -> Group:
+    """Load a group, checking that the user is a member"""
+    group = await db.get(Group, group_id)
+    if not group:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Group not found"
+        )
+    
+    if await db.get(GroupMember, (group_id, user_id)) is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not a member of this group"
+        )
+    
+    return group
+
+
+async def check_users_exist(db: AsyncSession, user_ids: List[int]):
+    """404 unless every id belongs to a user"""
+    user_ids = set(user_ids)
+    result = await db.execute(select(func.count()).select_from(User).where(User.id.in_(user_ids)))
+    if result.scalar() != len(user_ids):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+
+
+def group_response(group: Group, member_ids: List[int]) -> GroupResponse:
+    return GroupResponse(
+        id=group.id,
+        name=group.name,
+        created_by=group.created_by,
+        member_ids=member_ids,
+        created_at=group.created_at
+    )
+
+
+@router.post("/", response_model=GroupResponse, status_code=status.HTTP_201_CREATED)
+async def create_group(
+    group_data: GroupCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user)
+):
+    """Create a group; the creator is always a member"""
+    member_ids = sorted(set(group_data.member_ids) | {current_user.id})
+    await check_users_exist(db, member_ids)
+    
+    group = Group(name=group_data.name, created_by=current_user.id)
+    db.add(group)
+    await db.flush()
+    db.add_all(GroupMember(group_id=group.id, user_id=user_id) for user_id in member_ids)
+    await db.commit()
+    await db.refresh(group)
+    
+    return group_response(group, member_ids)
+
+
+@router.get("/", response_model=List[GroupResponse])
+async def get_groups(
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user)
+):
+    """Get the groups of the current user"""
+    my_group_ids = select(GroupMember.group_id).where(GroupMember.user_id == current_user.id)
+    
+    result = await db.execute(select(Group).where(Group.id.in_(my_group_ids)).order_by(Group.id))
+    groups = result.scalars().all()
+    
+    result = await db.execute(
+        select(GroupMember.group_id, GroupMember.user_id)
+        .where(GroupMember.group_id.in_(my_group_ids))
+        .order_by(GroupMember.user_id)
+    )
+    members: Dict[int, List[int]] = defaultdict(list)
+    for group_id, user_id in result.all():
+        members[group_id].append(user_id)
+    
+    return [group_response(group, members[group.id]) for group in groups]
+
+
+@router.get("/{group_id}", response_model=GroupResponse)
+async def get_group(
+    group_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user)
+):
+    """Get a specific group"""
+    group = await get_group_for_member(db, group_id, current_user.id)
+    return group_response(group, await get_member_ids(db, group_id))
+
+
+@router.post("/{group_id}/members/{user_id}", response_model=GroupResponse)
+async def add_member(
+    group_id: int,
+    user_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user)
+):
+    """Add a user to a group (any member can add)"""
+    group = await get_group_for_member(db, group_id, current_user.id)
+    await check_users_exist(db, [user_id])
+    
+    if await db.get(GroupMember, (group_id, user_id)) is None:
+        db.add(GroupMember(group_id=group_id, user_id=user_id))
+        await db.commit()
+    
+    return group_response(group, await get_member_ids(db, group_id))
+
+
+@router.post("/{group_id}/expenses", response_model=GroupExpenseResponse, status_code=status.HTTP_201_CREATED)
+async def create_group_expense(
+    expense_data: GroupExpenseCreate,
+    group_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user)
+):
+    """Record an expense paid by the current user and split it among group members"""
+    await get_group_for_member(db, group_id, current_user.id)
+    member_ids = await get_member_ids(db, group_id)
+    
+    participant_ids = expense_data.participant_ids
+    if participant_ids is None:
+        participant_ids = list(expense_data.shares) if expense_data.shares else member_ids
+    
+    if set(participant_ids) - set(member_ids):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Participants must be members of the group"
+        )
+    
+    try:
+        if expense_data.shares is not None:
+            shares = validate_shares(expense_data.amount, expense_data.shares, participant_ids)
+        else:
+            shares = split_equally(expense_data.amount, participant_ids)
+    except InvalidSplitError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    # Group expenses are bought items too; record them as a completed task
+    task = Task(
+        created_by=current_user.id,
+        assigned_to=current_user.id,
+        item_name=expense_data.item_name,
+        status=TaskStatus.COMPLETED,
+        completed_at=datetime.utcnow()
+    )
+    db.add(task)
+    await db.flush()
+    
+    expense = Expense(
+        task_id=task.id,
+        paid_by=current_user.id,
+        amount=expense_data.amount,
+        group_id=group_id
+    )
+    db.add(expense)
+    debts = await add_expense_debts(db, current_user.id, shares)
+    await db.commit()
+    
+    return GroupExpenseResponse(
+        expense_id=expense.id,
+        task_id=task.id,
+        amount=expense.amount,
+        shares=shares,
+        debt_ids=[debt.id for debt in debts]
+    )
@@ -1,49 +1,67 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from app.database import get_db
-from app.models import User, Message
-from app.schemas import MessageResponse
+from app.models import Message
+from app.schemas import MessageResponse, MessageSearchResult, Page
 from app.auth.dependencies import get_current_user
+from app.auth.cache import UserSnapshot
+from app.pagination import paginate
+from app.responses import page_response, response_columns
+from app.search import search_messages
 
 router = APIRouter(prefix="/api/messages", tags=["Messages"])
 
 
-@router.get("/", response_model=List[MessageResponse])
+@router.get("/", response_model=Page[MessageResponse])
 async def get_messages(
     other_user_id: Optional[int] = Query(None, description="Filter messages with specific user"),
-    limit: int = Query(50, le=100),
-    offset: int = Query(0, ge=0),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
-    """Get message history"""
-    query = db.query(Message)
+    """Get message history, newest first"""
+    query = select(*response_columns(MessageResponse, Message))
     
     if other_user_id:
         # Get messages between current user and specific user
-        query = query.filter(
+        query = query.where(
             ((Message.sender_id == current_user.id) & (Message.receiver_id == other_user_id)) |
             ((Message.sender_id == other_user_id) & (Message.receiver_id == current_user.id))
         )
     else:
         # Get all messages for current user
-        query = query.filter(
+        query = query.where(
             (Message.sender_id == current_user.id) | (Message.receiver_id == current_user.id)
         )
     
-    messages = query.order_by(Message.created_at.desc()).offset(offset).limit(limit).all()
-    return messages
+    result = await db.execute(paginate(query, Message, cursor, limit))
+    return page_response(result.all(), limit)
+
+
+@router.get("/search", response_model=Page[MessageSearchResult])
+async def search(
+    q: str = Query(..., min_length=1, max_length=200, description="Search words"),
+    other_user_id: Optional[int] = Query(None, description="Search only messages with specific user"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user)
+):
+    """Full-text search in message history, best match first"""
+    return await search_messages(db, current_user.id, q, limit, cursor, other_user_id)
 
 
 @router.get("/{message_id}", response_model=MessageResponse)
 async def get_message(
     message_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
     """Get a specific message"""
-    message = db.query(Message).filter(Message.id == message_id).first()
+    message = await db.get(Message, message_id)
     
     if not message:
         raise HTTPException(
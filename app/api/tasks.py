@@ -1,49 +1,67 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from app.database import get_db
-from app.models import User, Task, TaskStatus
-from app.schemas import TaskResponse, TaskUpdate
+from app.models import Task, TaskStatus
+from app.schemas import TaskResponse, TaskUpdate, Page
 from app.auth.dependencies import get_current_user
+from app.auth.cache import UserSnapshot
+from app.pagination import paginate
+from app.responses import page_response, response_columns, make_etag, etag_matches, set_etag, not_modified
+from app.versions import TASKS, get_version
 from datetime import datetime
 
 router = APIRouter(prefix="/api/tasks", tags=["Tasks"])
 
 
-@router.get("/", response_model=List[TaskResponse])
+@router.get("/", response_model=Page[TaskResponse])
 async def get_tasks(
+    request: Request,
     status_filter: Optional[TaskStatus] = Query(None, description="Filter by status"),
     assigned_to: Optional[int] = Query(None, description="Filter by assignee"),
     created_by: Optional[int] = Query(None, description="Filter by creator"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
-    """Get tasks (filtered)"""
-    query = db.query(Task).filter(
+    """
+    Get tasks (filtered), newest first
+    
+    Sends an ETag; with a matching If-None-Match the answer is 304 after
+    a single version lookup.
+    """
+    # Read the version first: a change committed meanwhile can only make the tag stale, never the data
+    etag = make_etag(request, TASKS, current_user.id, await get_version(db, TASKS, current_user.id))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    
+    query = select(*response_columns(TaskResponse, Task)).where(
         (Task.created_by == current_user.id) | (Task.assigned_to == current_user.id)
     )
     
     if status_filter:
-        query = query.filter(Task.status == status_filter)
+        query = query.where(Task.status == status_filter)
     
     if assigned_to:
-        query = query.filter(Task.assigned_to == assigned_to)
+        query = query.where(Task.assigned_to == assigned_to)
     
     if created_by:
-        query = query.filter(Task.created_by == created_by)
+        query = query.where(Task.created_by == created_by)
     
-    tasks = query.order_by(Task.created_at.desc()).all()
-    return tasks
+    result = await db.execute(paginate(query, Task, cursor, limit))
+    return set_etag(page_response(result.all(), limit), etag)
 
 
 @router.get("/{task_id}", response_model=TaskResponse)
 async def get_task(
     task_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
     """Get a specific task"""
-    task = db.query(Task).filter(Task.id == task_id).first()
+    task = await db.get(Task, task_id)
     
     if not task:
         raise HTTPException(
@@ -65,11 +83,11 @@ async def get_task(
 async def update_task(
     task_id: int,
     task_update: TaskUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
     """Update a task (manual update)"""
-    task = db.query(Task).filter(Task.id == task_id).first()
+    task = await db.get(Task, task_id)
     
     if not task:
         raise HTTPException(
@@ -93,8 +111,8 @@ async def update_task(
     if task_update.completed_at is not None:
         task.completed_at = task_update.completed_at
     
-    db.commit()
-    db.refresh(task)
+    await db.commit()
+    await db.refresh(task)
     
     return task
 
@@ -102,11 +120,11 @@ async def update_task(
 @router.delete("/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_task(
     task_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
     """Delete a task"""
-    task = db.query(Task).filter(Task.id == task_id).first()
+    task = await db.get(Task, task_id)
     
     if not task:
         raise HTTPException(
@@ -121,8 +139,8 @@ async def delete_task(
             detail="Not authorized to delete this task"
         )
     
-    db.delete(task)
-    db.commit()
+    await db.delete(task)
+    await db.commit()
     
     return None
 
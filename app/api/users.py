@@ -1,32 +1,56 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
 from app.database import get_db
 from app.models import User
-from app.schemas import UserResponse
+from app.schemas import UserResponse, UserDirectoryEntry, Page
 from app.auth.dependencies import get_current_user
+from app.auth.cache import UserSnapshot
+from app.responses import FastJSONResponse, make_etag, etag_matches, set_etag, not_modified
+from app.directory import list_users
+from app.websocket.manager import manager
+from app.versions import USERS, get_version
 
 router = APIRouter(prefix="/api/users", tags=["Users"])
 
 
-@router.get("/", response_model=List[UserResponse])
-async def get_all_users(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+@router.get("/", response_model=Page[UserDirectoryEntry])
+async def get_users(
+    request: Request,
+    q: Optional[str] = Query(None, max_length=50, description="Username prefix (case-insensitive)"),
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
-    """Get all users"""
-    users = db.query(User).all()
-    return users
+    """
+    User directory ordered by username, with online flags
+    
+    Conditional on ETag: the tag covers registrations and, since it
+    includes online flags, this worker's view of presence.
+    """
+    etag = make_etag(
+        request, USERS, await get_version(db, USERS),
+        manager.broker.node_id, manager.presence_version
+    )
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    
+    page = await list_users(db, limit, cursor, q)
+    online = manager.online_users([item["id"] for item in page["items"]])
+    for item in page["items"]:
+        item["online"] = item["id"] in online
+    return set_etag(FastJSONResponse(page), etag)
 
 
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
     """Get a specific user by ID"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
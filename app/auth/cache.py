@@ -0,0 +1,118 @@
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from sqlalchemy import event
+from app.config import settings
+from app.models import User
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """Read-only copy of the user fields request handlers use"""
+    id: int
+    username: str
+    email: str
+    created_at: Optional[datetime]
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserSnapshot":
+        return cls(id=user.id, username=user.username, email=user.email, created_at=user.created_at)
+
+
+class AuthCache:
+    """
+    In-memory cache of verified tokens and authenticated users
+
+    Tokens are keyed by their SHA-256 hash and map to the user id until the
+    token's exp; a hit skips JWT decoding. Users are kept as snapshots by id
+    for a short TTL and dropped explicitly whenever the users row changes,
+    so a hit on both skips the database. Both maps are bounded LRUs.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = settings.AUTH_TOKEN_CACHE_SIZE,
+        max_users: int = settings.AUTH_USER_CACHE_SIZE,
+        user_ttl_seconds: float = settings.AUTH_USER_CACHE_TTL_SECONDS
+    ):
+        self.max_tokens = max_tokens
+        self.max_users = max_users
+        self.user_ttl_seconds = user_ttl_seconds
+        self._tokens: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self._users: "OrderedDict[int, Tuple[UserSnapshot, float]]" = OrderedDict()
+        self.stats: Dict[str, int] = {"token_hits": 0, "token_misses": 0, "user_hits": 0, "user_misses": 0}
+
+    @staticmethod
+    def token_key(token: str) -> str:
+        """Cache key for a token; raw tokens are never kept in memory"""
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get_principal(self, token: str) -> Optional[int]:
+        """User id of a previously verified, unexpired token"""
+        key = self.token_key(token)
+        entry = self._tokens.get(key)
+        if entry is not None:
+            user_id, expires_at = entry
+            if expires_at > time.time():
+                self._tokens.move_to_end(key)
+                self.stats["token_hits"] += 1
+                return user_id
+            del self._tokens[key]
+
+        self.stats["token_misses"] += 1
+        return None
+
+    def put_principal(self, token: str, user_id: int, expires_at: float):
+        """Remember a verified token until its exp (a Unix timestamp)"""
+        if expires_at <= time.time():
+            return
+        key = self.token_key(token)
+        self._tokens[key] = (user_id, expires_at)
+        self._tokens.move_to_end(key)
+        while len(self._tokens) > self.max_tokens:
+            self._tokens.popitem(last=False)
+
+    def get_user(self, user_id: int) -> Optional[UserSnapshot]:
+        """Cached snapshot of a user"""
+        entry = self._users.get(user_id)
+        if entry is not None:
+            snapshot, expires_at = entry
+            if expires_at > time.monotonic():
+                self._users.move_to_end(user_id)
+                self.stats["user_hits"] += 1
+                return snapshot
+            del self._users[user_id]
+
+        self.stats["user_misses"] += 1
+        return None
+
+    def put_user(self, user: User) -> UserSnapshot:
+        """Cache a snapshot of a loaded user and return it"""
+        snapshot = UserSnapshot.from_user(user)
+        self._users[snapshot.id] = (snapshot, time.monotonic() + self.user_ttl_seconds)
+        self._users.move_to_end(snapshot.id)
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+        return snapshot
+
+    def invalidate_user(self, user_id: int):
+        """Drop a user's snapshot; the next request reloads it from the database"""
+        self._users.pop(user_id, None)
+
+    def clear(self):
+        self._tokens.clear()
+        self._users.clear()
+
+
+# Global auth cache instance
+auth_cache = AuthCache()
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target):
+    """Drop cached snapshots whenever a user row is changed through the ORM"""
+    auth_cache.invalidate_user(target.id)
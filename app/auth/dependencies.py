@@ -1,18 +1,54 @@
+from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app.models import User
 from app.auth.jwt import verify_token
+from app.auth.cache import UserSnapshot, auth_cache
 
 # OAuth2 scheme for token authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 
+async def authenticate_token(token: str, db: AsyncSession) -> Optional[UserSnapshot]:
+    """
+    Resolve a JWT to the user it was issued for
+
+    A token seen before is answered from the auth cache without decoding it,
+    and a cached user snapshot without touching the database; only misses
+    decode the token or load the user (by id, or by username for tokens
+    issued before the uid claim).
+    """
+    token_data = None
+    user_id = auth_cache.get_principal(token)
+    if user_id is None:
+        token_data = verify_token(token)
+        if token_data is None or token_data.username is None:
+            return None
+        user_id = token_data.user_id
+
+    snapshot = auth_cache.get_user(user_id) if user_id is not None else None
+    if snapshot is None:
+        if user_id is not None:
+            user = await db.get(User, user_id)
+        else:
+            result = await db.execute(select(User).where(User.username == token_data.username))
+            user = result.scalar_one_or_none()
+        if user is None:
+            return None
+        snapshot = auth_cache.put_user(user)
+
+    if token_data is not None and token_data.exp:
+        auth_cache.put_principal(token, snapshot.id, token_data.exp)
+    return snapshot
+
+
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
+    db: AsyncSession = Depends(get_db)
+) -> UserSnapshot:
     """Get current authenticated user from JWT token"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -20,11 +56,7 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    token_data = verify_token(token)
-    if token_data is None or token_data.username is None:
-        raise credentials_exception
-    
-    user = db.query(User).filter(User.username == token_data.username).first()
+    user = await authenticate_token(token, db)
     if user is None:
         raise credentials_exception
     
@@ -32,8 +64,8 @@ async def get_current_user(
 
 
 async def get_current_active_user(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: UserSnapshot = Depends(get_current_user)
+) -> UserSnapshot:
     """Get current active user (can add more checks here)"""
     return current_user
 
@@ -26,7 +26,7 @@ def verify_token(token: str) -> Optional[TokenData]:
         username: str = payload.get("sub")
         if username is None:
             return None
-        return TokenData(username=username)
+        return TokenData(username=username, user_id=payload.get("uid"), exp=payload.get("exp"))
     except JWTError:
         return None
 
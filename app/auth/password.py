@@ -1,7 +1,18 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
 from passlib.context import CryptContext
+from app.config import settings
 
 # Password hashing context (support legacy pbkdf2_sha256 hashes)
-pwd_context = CryptContext(schemes=["bcrypt", "pbkdf2_sha256"], deprecated="auto")
+# Hashes that are deprecated or below the configured bcrypt cost are
+# flagged by verify_and_update and rehashed on the next successful login
+pwd_context = CryptContext(
+    schemes=["bcrypt", "pbkdf2_sha256"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS
+)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -11,4 +22,77 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 def get_password_hash(password: str) -> str:
     """Hash a password"""
-    return pwd_context.hash(password)
\ No newline at end of file
+    return pwd_context.hash(password)
+
+
+class HasherBusyError(Exception):
+    """Too many password hashes are already running or waiting"""
+
+
+class PasswordHasher:
+    """
+    Runs password hashing off the event loop
+
+    bcrypt costs 100+ ms of CPU per call; running it inline stalls every
+    request and WebSocket on the worker. Calls go to a dedicated thread
+    pool (bcrypt and hashlib release the GIL) and at most workers +
+    max_waiting of them are admitted at once; the rest fail fast with
+    HasherBusyError instead of queueing without bound.
+    """
+
+    def __init__(
+        self,
+        workers: int = settings.PASSWORD_HASH_WORKERS,
+        max_waiting: int = settings.PASSWORD_HASH_QUEUE_SIZE
+    ):
+        self.workers = workers
+        self.max_waiting = max_waiting
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._in_flight = 0
+        self.stats: Dict[str, int] = {"hashed": 0, "verified": 0, "rehashed": 0, "rejected": 0}
+
+    async def hash(self, password: str) -> str:
+        """Hash a new password"""
+        result = await self._run(pwd_context.hash, password)
+        self.stats["hashed"] += 1
+        return result
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        Verify a password and upgrade its hash if needed
+
+        Returns:
+            tuple: (valid, new_hash); new_hash is set when the stored hash
+                uses a deprecated scheme or a lower bcrypt cost and should
+                be replaced
+        """
+        valid, new_hash = await self._run(pwd_context.verify_and_update, password, hashed_password)
+        self.stats["verified"] += 1
+        if new_hash:
+            self.stats["rehashed"] += 1
+        return valid, new_hash
+
+    def shutdown(self):
+        """Stop the worker threads"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _run(self, func, *args):
+        """Run func in the pool, or raise HasherBusyError if it is saturated"""
+        if self._in_flight >= self.workers + self.max_waiting:
+            self.stats["rejected"] += 1
+            raise HasherBusyError()
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+
+        self._in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self._in_flight -= 1
+
+
+# Global password hasher instance
+password_hasher = PasswordHasher()
@@ -1,27 +1,109 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
 
-# Create database engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-    echo=settings.DEBUG
-)
+# Async drivers used by the application engine
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
 
-# Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def get_async_database_url(url: str) -> str:
+    """Map DATABASE_URL (e.g. postgresql://...) to its async driver"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    parsed = parsed.set(drivername=ASYNC_DRIVERS.get(backend, parsed.drivername))
+    if backend == "postgresql":
+        # asyncpg always uses UTF-8 and rejects libpq-only options
+        parsed = parsed.difference_update_query(["client_encoding"])
+    return parsed.render_as_string(hide_password=False)
+
+
+def _pool_options() -> dict:
+    """
+    Pool settings for DATABASE_URL
+    
+    Pool size is independent of the number of open WebSockets, which only
+    check out a connection while a frame is being processed.
+    """
+    if settings.DATABASE_URL.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT
+    }
+
+
+# Engines are created on first use, so importing the app loads no database
+# driver and needs no reachable database
+_engines = {}
+
+
+def get_engine():
+    """Database engine (used by scripts and migrations)"""
+    if "sync" not in _engines:
+        _engines["sync"] = create_engine(
+            settings.DATABASE_URL,
+            pool_pre_ping=True,
+            echo=settings.DEBUG,
+            **_pool_options()
+        )
+    return _engines["sync"]
+
+
+def get_async_engine():
+    """Async database engine (used by the application)"""
+    if "async" not in _engines:
+        _engines["async"] = create_async_engine(
+            get_async_database_url(settings.DATABASE_URL),
+            pool_pre_ping=True,
+            echo=settings.DEBUG,
+            **_pool_options()
+        )
+    return _engines["async"]
+
+
+class LazySessionMaker(sessionmaker):
+    """sessionmaker that binds to its engine when the first session is made"""
+    
+    def __init__(self, get_bind, **kw):
+        super().__init__(**kw)
+        self._get_bind = get_bind
+    
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None:
+            self.configure(bind=self._get_bind())
+        return super().__call__(**local_kw)
+
+
+class LazyAsyncSessionMaker(async_sessionmaker):
+    """async_sessionmaker that binds to its engine when the first session is made"""
+    
+    def __init__(self, get_bind, **kw):
+        super().__init__(**kw)
+        self._get_bind = get_bind
+    
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None:
+            self.configure(bind=self._get_bind())
+        return super().__call__(**local_kw)
+
+
+# Create session factories
+SessionLocal = LazySessionMaker(get_engine, autocommit=False, autoflush=False)
+# Objects stay usable after commit; async sessions cannot lazy-load expired attributes
+AsyncSessionLocal = LazyAsyncSessionMaker(get_async_engine, autoflush=False, expire_on_commit=False)
 
 # Base class for models
 Base = declarative_base()
 
 
-def get_db():
-    """Dependency for getting database session"""
-    db = SessionLocal()
-    try:
+async def get_db():
+    """Dependency for getting an async database session"""
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
-
@@ -0,0 +1,53 @@
+from typing import Optional
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import User, username_key
+from app.schemas import UserResponse
+from app.pagination import decode_key_cursor, encode_key_cursor
+from app.responses import response_columns
+
+
+def _prefix_upper_bound(prefix: str) -> str:
+    """Smallest string greater than every string starting with prefix"""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+async def list_users(
+    db: AsyncSession,
+    limit: int,
+    cursor: Optional[str] = None,
+    prefix: Optional[str] = None
+) -> dict:
+    """
+    Page of the user directory, ordered by username (case-insensitive)
+
+    An optional username prefix is matched case-insensitively as a key
+    range, so both the filter and the order come from ix_users_username_key
+    and a page costs the same at any depth. Pages continue after a
+    (key, id) cursor.
+
+    Returns:
+        dict: items (dicts with the UserResponse fields) and next_cursor
+    """
+    key = username_key(User.username, collate=db.bind.dialect.name == "postgresql")
+    query = select(*response_columns(UserResponse, User), key.label("sort_key"))
+
+    # Folded like SQL lower(); SQLite only folds ASCII letters
+    prefix = (prefix or "").strip().lower()
+    if prefix:
+        query = query.where(key >= prefix, key < _prefix_upper_bound(prefix))
+
+    if cursor:
+        cursor_key, cursor_id = decode_key_cursor(cursor)
+        query = query.where(tuple_(key, User.id) > tuple_(cursor_key, cursor_id))
+
+    result = await db.execute(query.order_by(key, User.id).limit(limit + 1))
+    rows = result.all()
+
+    items = [row._asdict() for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_key_cursor(items[-1]["sort_key"], items[-1]["id"])
+    for item in items:
+        del item["sort_key"]
+    return {"items": items, "next_cursor": next_cursor}
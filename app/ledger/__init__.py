@@ -0,0 +1 @@
+# Debt ledger module
@@ -0,0 +1,210 @@
+from typing import Dict, List
+from sqlalchemy import select, delete, update, func, case, false, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import Balance, Debt, DebtStatus, User
+from app.versions import DEBTS, bump_versions
+
+# Amounts are floats; differences below this are rounding noise
+TOLERANCE = 0.01
+
+
+async def lock_pair(db: AsyncSession, user1_id: int, user2_id: int):
+    """
+    Serialize ledger changes for a pair of users until the caller commits
+
+    Locks the pair's balance row (SELECT ... FOR UPDATE) so settlements and
+    compactions of the same pair run one after the other. SQLite has no row
+    locks; there a no-op write takes the database write lock instead.
+    """
+    if db.bind.dialect.name == "sqlite":
+        await db.execute(
+            update(Balance).where(false()).values(a_owes=Balance.a_owes)
+            .execution_options(synchronize_session=False)
+        )
+        return
+
+    user_a, user_b = sorted((user1_id, user2_id))
+    await db.execute(
+        select(Balance.user_a)
+        .where(Balance.user_a == user_a, Balance.user_b == user_b)
+        .with_for_update()
+    )
+
+
+async def apply_debt_change(db: AsyncSession, debtor_id: int, creditor_id: int, delta: float):
+    """
+    Add delta to what debtor owes creditor in the pair's balance row
+
+    Use a positive delta for new debts and a negative one for payments and
+    settlements. Runs as a single upsert in the caller's transaction; the
+    caller commits together with the debt change itself.
+    """
+    if debtor_id == creditor_id or not delta:
+        return
+
+    await bump_versions(db, DEBTS, (debtor_id, creditor_id))
+
+    user_a, user_b = sorted((debtor_id, creditor_id))
+    a_delta = delta if debtor_id == user_a else 0.0
+    b_delta = delta if debtor_id == user_b else 0.0
+
+    insert = pg_insert if db.bind.dialect.name == "postgresql" else sqlite_insert
+    statement = insert(Balance).values(
+        user_a=user_a,
+        user_b=user_b,
+        a_owes=a_delta,
+        b_owes=b_delta,
+        net_amount=b_delta - a_delta
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[Balance.user_a, Balance.user_b],
+        set_={
+            "a_owes": Balance.a_owes + a_delta,
+            "b_owes": Balance.b_owes + b_delta,
+            "net_amount": Balance.net_amount + (b_delta - a_delta),
+            "updated_at": func.now()
+        }
+    )
+    await db.execute(statement)
+
+
+async def get_pair_balance(db: AsyncSession, user1_id: int, user2_id: int) -> Dict[str, float]:
+    """
+    Balance between two users with a single primary-key lookup
+
+    Returns:
+        dict: user1_owes, user2_owes and net_balance (positive if user1 should receive)
+    """
+    if user1_id == user2_id:
+        return {"user1_owes": 0.0, "user2_owes": 0.0, "net_balance": 0.0}
+
+    user_a, user_b = sorted((user1_id, user2_id))
+    balance = await db.get(Balance, (user_a, user_b), populate_existing=True)
+    if balance is None:
+        return {"user1_owes": 0.0, "user2_owes": 0.0, "net_balance": 0.0}
+
+    if user1_id == user_a:
+        return {"user1_owes": balance.a_owes, "user2_owes": balance.b_owes, "net_balance": balance.net_amount}
+    return {"user1_owes": balance.b_owes, "user2_owes": balance.a_owes, "net_balance": -balance.net_amount}
+
+
+async def get_user_totals(db: AsyncSession, user_id: int) -> Dict[str, float]:
+    """
+    Totals over all of a user's counterparties, summed from balance rows
+
+    Returns:
+        dict: total_owed and total_to_collect
+    """
+    result = await db.execute(
+        select(
+            func.coalesce(func.sum(case((Balance.user_a == user_id, Balance.a_owes), else_=Balance.b_owes)), 0.0),
+            func.coalesce(func.sum(case((Balance.user_a == user_id, Balance.b_owes), else_=Balance.a_owes)), 0.0)
+        ).where(or_(Balance.user_a == user_id, Balance.user_b == user_id))
+    )
+    total_owed, total_to_collect = result.one()
+    return {"total_owed": float(total_owed), "total_to_collect": float(total_to_collect)}
+
+
+async def get_counterparty_balances(db: AsyncSession, user_id: int) -> List[Dict]:
+    """
+    Balance with every counterparty in one query
+
+    Reads the user's balance rows joined to the other user's name, as plain
+    rows without loading ORM objects. Settled pairs are left out.
+
+    Returns:
+        list: user_id, username, total_owed, total_to_collect and net_balance
+            per counterparty, seen from user_id, largest net amount first
+    """
+    is_a = Balance.user_a == user_id
+    other_id = case((is_a, Balance.user_b), else_=Balance.user_a)
+    owed = case((is_a, Balance.a_owes), else_=Balance.b_owes)
+    to_collect = case((is_a, Balance.b_owes), else_=Balance.a_owes)
+
+    result = await db.execute(
+        select(
+            other_id.label("user_id"),
+            User.username,
+            owed.label("total_owed"),
+            to_collect.label("total_to_collect"),
+            (to_collect - owed).label("net_balance")
+        )
+        .join(User, User.id == other_id)
+        .where(
+            or_(Balance.user_a == user_id, Balance.user_b == user_id),
+            or_(Balance.a_owes > TOLERANCE, Balance.b_owes > TOLERANCE)
+        )
+        .order_by(func.abs(to_collect - owed).desc(), User.username)
+    )
+    return [dict(row._mapping) for row in result.all()]
+
+
+def _active_debt_totals():
+    """Per-pair totals of active debts, in balance-row orientation"""
+    user_a = case((Debt.debtor_id < Debt.creditor_id, Debt.debtor_id), else_=Debt.creditor_id)
+    user_b = case((Debt.debtor_id < Debt.creditor_id, Debt.creditor_id), else_=Debt.debtor_id)
+    a_owes = func.sum(case((Debt.debtor_id < Debt.creditor_id, Debt.amount), else_=0.0))
+    b_owes = func.sum(case((Debt.debtor_id > Debt.creditor_id, Debt.amount), else_=0.0))
+    return (
+        select(user_a.label("user_a"), user_b.label("user_b"), a_owes.label("a_owes"), b_owes.label("b_owes"))
+        .where(Debt.status == DebtStatus.ACTIVE, Debt.debtor_id != Debt.creditor_id)
+        .group_by(user_a, user_b)
+    )
+
+
+async def check_balances(db: AsyncSession) -> List[Dict[str, float]]:
+    """
+    Compare every balance row with the active debts it summarizes
+
+    Returns:
+        list: One entry per pair whose stored totals differ from the debts
+    """
+    expected = {
+        (row.user_a, row.user_b): (row.a_owes, row.b_owes)
+        for row in (await db.execute(_active_debt_totals())).all()
+    }
+    stored = {
+        (row.user_a, row.user_b): (row.a_owes, row.b_owes)
+        for row in (await db.execute(select(Balance))).scalars().all()
+    }
+
+    mismatches = []
+    for pair in expected.keys() | stored.keys():
+        exp_a, exp_b = expected.get(pair, (0.0, 0.0))
+        got_a, got_b = stored.get(pair, (0.0, 0.0))
+        if abs(exp_a - got_a) > TOLERANCE or abs(exp_b - got_b) > TOLERANCE:
+            mismatches.append({
+                "user_a": pair[0],
+                "user_b": pair[1],
+                "expected_a_owes": exp_a,
+                "expected_b_owes": exp_b,
+                "stored_a_owes": got_a,
+                "stored_b_owes": got_b
+            })
+    return mismatches
+
+
+async def rebuild_balances(db: AsyncSession) -> int:
+    """
+    Recompute all balance rows from active debts
+
+    Returns:
+        int: Number of balance rows written
+    """
+    old_pairs = (await db.execute(select(Balance.user_a, Balance.user_b))).all()
+    await db.execute(delete(Balance))
+    rows = (await db.execute(_active_debt_totals())).all()
+    for row in rows:
+        db.add(Balance(
+            user_a=row.user_a,
+            user_b=row.user_b,
+            a_owes=row.a_owes,
+            b_owes=row.b_owes,
+            net_amount=row.b_owes - row.a_owes
+        ))
+    # Balances may have changed for anyone in an old or a new row
+    await bump_versions(db, DEBTS, {user for pair in [*old_pairs, *rows] for user in pair[:2]})
+    await db.commit()
+    return len(rows)
@@ -0,0 +1,167 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import Integer, and_, case, delete, func, insert, literal, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import ArchivedDebt, Debt, DebtCompaction, DebtStatus
+from app.ledger.balances import TOLERANCE, apply_debt_change, lock_pair
+from app.versions import DEBTS, bump_versions
+
+# Settled debts moved to the archive per transaction
+ARCHIVE_BATCH_SIZE = 1000
+
+
+def _move_to_archive(debt_ids: List[int], compaction_id: Optional[int] = None):
+    """INSERT ... SELECT copying debts into debts_archive as settled"""
+    return insert(ArchivedDebt).from_select(
+        ["id", "debtor_id", "creditor_id", "amount", "status", "created_at", "compaction_id"],
+        select(
+            Debt.id, Debt.debtor_id, Debt.creditor_id, Debt.amount,
+            literal(DebtStatus.SETTLED, ArchivedDebt.status.type),
+            Debt.created_at,
+            literal(compaction_id, Integer)
+        ).where(Debt.id.in_(debt_ids))
+    )
+
+
+async def pairs_to_compact(db: AsyncSession) -> List[Tuple[int, int]]:
+    """Pairs (user_a < user_b) with more than one active debt between them"""
+    user_a = case((Debt.debtor_id < Debt.creditor_id, Debt.debtor_id), else_=Debt.creditor_id)
+    user_b = case((Debt.debtor_id < Debt.creditor_id, Debt.creditor_id), else_=Debt.debtor_id)
+    rows = await db.execute(
+        select(user_a, user_b)
+        .where(Debt.status == DebtStatus.ACTIVE, Debt.debtor_id != Debt.creditor_id)
+        .group_by(user_a, user_b)
+        .having(func.count() > 1)
+    )
+    return [tuple(row) for row in rows.all()]
+
+
+async def compact_pair(db: AsyncSession, user_a: int, user_b: int) -> Optional[DebtCompaction]:
+    """
+    Net all active debts between two users into at most one debt
+
+    The replaced debts move to debts_archive as settled (nothing is owed
+    on them any more), tagged with the DebtCompaction row that records
+    what was netted. Runs in one
+    transaction under the pair lock, so it cannot interleave with a
+    payment or settlement of the same pair; the caller commits.
+
+    Returns:
+        DebtCompaction, or None if there was nothing to compact
+    """
+    await lock_pair(db, user_a, user_b)
+
+    pair_filter = or_(
+        and_(Debt.debtor_id == user_a, Debt.creditor_id == user_b),
+        and_(Debt.debtor_id == user_b, Debt.creditor_id == user_a)
+    )
+    rows = await db.execute(
+        select(Debt.id, Debt.debtor_id, Debt.amount)
+        .where(pair_filter, Debt.status == DebtStatus.ACTIVE)
+        .order_by(Debt.id)
+        .with_for_update()
+    )
+    debts = rows.all()
+    if len(debts) < 2:
+        return None
+
+    a_owed = sum(debt.amount for debt in debts if debt.debtor_id == user_a)
+    b_owed = sum(debt.amount for debt in debts if debt.debtor_id == user_b)
+    net = b_owed - a_owed  # Positive if user_b still owes user_a
+
+    compaction = DebtCompaction(
+        user_a=user_a,
+        user_b=user_b,
+        debt_count=len(debts),
+        a_owed=a_owed,
+        b_owed=b_owed
+    )
+    db.add(compaction)
+    await db.flush()
+
+    # Move the netted debts to the archive in two set-based statements
+    debt_ids = [debt.id for debt in debts]
+    await db.execute(_move_to_archive(debt_ids, compaction.id))
+    await db.execute(delete(Debt).where(Debt.id.in_(debt_ids)).execution_options(synchronize_session=False))
+
+    new_a_owes, new_b_owes = 0.0, 0.0
+    if abs(net) > TOLERANCE:
+        debtor, creditor = (user_b, user_a) if net > 0 else (user_a, user_b)
+        remaining = Debt(debtor_id=debtor, creditor_id=creditor, amount=abs(net), status=DebtStatus.ACTIVE)
+        db.add(remaining)
+        await db.flush()
+        compaction.result_debt_id = remaining.id
+        new_a_owes, new_b_owes = (0.0, net) if net > 0 else (-net, 0.0)
+
+    await apply_debt_change(db, user_a, user_b, new_a_owes - a_owed)
+    await apply_debt_change(db, user_b, user_a, new_b_owes - b_owed)
+    # The history changes even when the totals do not
+    await bump_versions(db, DEBTS, (user_a, user_b))
+    return compaction
+
+
+async def archive_settled(db: AsyncSession, min_age_days: int = settings.DEBT_ARCHIVE_MIN_AGE_DAYS) -> int:
+    """
+    Move settled debts older than min_age_days to debts_archive
+
+    Works in batches of ARCHIVE_BATCH_SIZE, committing after each one so
+    no transaction holds many rows. Settled debts are never updated again,
+    so this needs no pair lock, and the debt history reads the same before
+    and after, so no version is bumped.
+
+    Returns:
+        int: Number of debts archived
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=min_age_days)
+    archived = 0
+    while True:
+        rows = await db.execute(
+            select(Debt.id)
+            .where(Debt.status == DebtStatus.SETTLED, Debt.created_at < cutoff)
+            .order_by(Debt.id)
+            .limit(ARCHIVE_BATCH_SIZE)
+        )
+        debt_ids = rows.scalars().all()
+        if not debt_ids:
+            return archived
+
+        await db.execute(_move_to_archive(debt_ids))
+        await db.execute(delete(Debt).where(Debt.id.in_(debt_ids)).execution_options(synchronize_session=False))
+        await db.commit()
+        archived += len(debt_ids)
+
+
+async def compact_all(db: AsyncSession, min_age_days: int = settings.DEBT_ARCHIVE_MIN_AGE_DAYS) -> Dict[str, int]:
+    """
+    Compact every pair with more than one active debt, then archive old settled debts
+
+    Each pair is compacted and committed in its own transaction.
+
+    Returns:
+        dict: pairs compacted, debts netted and settled debts archived
+    """
+    stats = {"pairs": 0, "netted": 0, "archived": 0}
+    for user_a, user_b in await pairs_to_compact(db):
+        compaction = await compact_pair(db, user_a, user_b)
+        await db.commit()
+        if compaction is not None:
+            stats["pairs"] += 1
+            stats["netted"] += compaction.debt_count
+
+    stats["archived"] = await archive_settled(db, min_age_days)
+    return stats
+
+
+async def compaction_loop(interval: float = settings.DEBT_COMPACTION_INTERVAL_SECONDS):
+    """Run compact_all every interval seconds until cancelled"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with AsyncSessionLocal() as db:
+                stats = await compact_all(db)
+            print(f"[COMPACTION] {stats}")
+        except Exception as e:
+            print(f"[COMPACTION] Error: {e}")
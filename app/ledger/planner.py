@@ -0,0 +1,136 @@
+import heapq
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import Balance, GroupMember, User
+from app.ledger.balances import TOLERANCE
+
+# (from_user_id, to_user_id, amount)
+Transfer = Tuple[int, int, float]
+
+
+def net_positions(pair_balances: Iterable[Tuple[int, int, float]]) -> Dict[int, int]:
+    """
+    Net position of every user in cents from (user_a, user_b, net_amount) rows
+
+    Positive means the user should receive money, negative that they owe.
+    """
+    positions: Dict[int, int] = defaultdict(int)
+    for user_a, user_b, net_amount in pair_balances:
+        cents = round(net_amount * 100)
+        positions[user_a] += cents
+        positions[user_b] -= cents
+    return positions
+
+
+def plan_transfers(positions: Dict[int, int]) -> List[Transfer]:
+    """
+    Minimal-ish set of transfers that brings every position to zero
+
+    Debtors and creditors with exactly opposite positions are paired first;
+    the rest is settled greedily, always matching the largest debtor with
+    the largest creditor (min cash flow). Each step zeroes at least one
+    person, so there are at most n - 1 transfers, in O(n log n).
+    Positions are in cents and must add up to zero.
+    """
+    if sum(positions.values()) != 0:
+        raise ValueError("Positions must add up to zero")
+
+    transfers: List[Transfer] = []
+
+    # Exact matches settle two people with one transfer
+    debtors_by_amount: Dict[int, List[int]] = defaultdict(list)
+    for user_id, cents in positions.items():
+        if cents < 0:
+            debtors_by_amount[-cents].append(user_id)
+
+    creditors: List[Tuple[int, int]] = []
+    matched = set()
+    for user_id, cents in positions.items():
+        if cents <= 0:
+            continue
+        if debtors_by_amount.get(cents):
+            debtor = debtors_by_amount[cents].pop()
+            matched.add(debtor)
+            transfers.append((debtor, user_id, cents / 100))
+        else:
+            creditors.append((-cents, user_id))
+
+    debtors = [(cents, user_id) for user_id, cents in positions.items() if cents < 0 and user_id not in matched]
+
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+    while creditors and debtors:
+        credit, creditor = heapq.heappop(creditors)
+        debt, debtor = heapq.heappop(debtors)
+        amount = min(-credit, -debt)
+        transfers.append((debtor, creditor, amount / 100))
+        if -credit > amount:
+            heapq.heappush(creditors, (credit + amount, creditor))
+        if -debt > amount:
+            heapq.heappush(debtors, (debt + amount, debtor))
+
+    return transfers
+
+
+async def build_settle_plan(db: AsyncSession, user_id: int, group_id: Optional[int] = None) -> dict:
+    """
+    Settle-up plan for a group, or for a user's own balances
+
+    Balances are pairwise and not scoped to groups, so a group plan nets
+    the members' whole balances with each other - private debts between
+    two members included - and may route money between any of them.
+    Without a group only the user's own pairs are read, and every pair is
+    settled directly with the user, so no one else's balances show up.
+
+    Returns:
+        dict: transfers (with usernames), transfer_count and debt_count
+            (pairs that currently owe each other)
+    """
+    if group_id is not None:
+        members = select(GroupMember.user_id).where(GroupMember.group_id == group_id).subquery("members")
+        rows = await db.execute(
+            select(Balance.user_a, Balance.user_b, Balance.net_amount).where(
+                Balance.user_a.in_(select(members.c.user_id)),
+                Balance.user_b.in_(select(members.c.user_id)),
+                func.abs(Balance.net_amount) > TOLERANCE
+            )
+        )
+        pair_balances = rows.all()
+        transfers = plan_transfers(net_positions(pair_balances))
+    else:
+        rows = await db.execute(
+            select(Balance.user_a, Balance.user_b, Balance.net_amount).where(
+                or_(Balance.user_a == user_id, Balance.user_b == user_id),
+                func.abs(Balance.net_amount) > TOLERANCE
+            )
+        )
+        pair_balances = rows.all()
+        # Positive net_amount means user_b owes user_a
+        transfers = [
+            (user_b, user_a, round(net_amount * 100) / 100) if net_amount > 0
+            else (user_a, user_b, round(-net_amount * 100) / 100)
+            for user_a, user_b, net_amount in pair_balances
+        ]
+
+    user_ids = {user for transfer in transfers for user in transfer[:2]}
+    usernames = {}
+    if user_ids:
+        rows = await db.execute(select(User.id, User.username).where(User.id.in_(user_ids)))
+        usernames = dict(rows.all())
+
+    return {
+        "transfers": [
+            {
+                "from_user_id": debtor,
+                "from_username": usernames.get(debtor),
+                "to_user_id": creditor,
+                "to_username": usernames.get(creditor),
+                "amount": amount
+            }
+            for debtor, creditor, amount in transfers
+        ],
+        "transfer_count": len(transfers),
+        "debt_count": len(pair_balances)
+    }
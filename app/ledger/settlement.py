@@ -0,0 +1,147 @@
+from typing import Any, Dict, Optional
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import Debt, DebtStatus
+from app.ledger.balances import TOLERANCE, apply_debt_change, lock_pair
+
+
+class NoActiveDebtsError(Exception):
+    """The debtor has no active debts to the creditor"""
+
+
+class AmountExceedsDebtError(Exception):
+    """A settlement larger than the total debt, where excess is not allowed"""
+
+    def __init__(self, total_debt: float):
+        super().__init__(f"Amount exceeds total debt ({total_debt} TL)")
+        self.total_debt = total_debt
+
+
+async def settle_debts(
+    db: AsyncSession,
+    debtor_id: int,
+    creditor_id: int,
+    amount: Optional[float] = None,
+    allow_excess: bool = False
+) -> Dict[str, Any]:
+    """
+    Pay off the debtor's active debts to the creditor, oldest first
+
+    The pair is locked (lock_pair) and its active debts are read with
+    SELECT ... FOR UPDATE, so concurrent payments and compactions for the
+    same pair run one after the other and each sees what the previous one
+    left. Fully paid debts are settled with one UPDATE; a partly paid debt
+    is reduced and the paid part is recorded as a separate settled debt.
+    The balance row is updated in the same transaction. The caller
+    commits (which releases the locks).
+
+    Args:
+        amount: Amount paid; None pays everything
+        allow_excess: Turn an overpayment into a debt of the creditor to
+            the debtor instead of raising AmountExceedsDebtError
+
+    Returns:
+        dict: total_debt, paid (applied to debts), excess, settled_debt_ids,
+            partially_paid, reverse_debt_id and remaining_debt
+
+    Raises:
+        NoActiveDebtsError, AmountExceedsDebtError
+    """
+    await lock_pair(db, debtor_id, creditor_id)
+
+    rows = await db.execute(
+        select(Debt.id, Debt.amount, Debt.created_at)
+        .where(
+            Debt.debtor_id == debtor_id,
+            Debt.creditor_id == creditor_id,
+            Debt.status == DebtStatus.ACTIVE
+        )
+        .order_by(Debt.created_at, Debt.id)
+        .with_for_update()
+    )
+    debts = rows.all()
+    if not debts:
+        raise NoActiveDebtsError()
+
+    total_debt = sum(debt.amount for debt in debts)
+    if amount is None:
+        amount = total_debt
+
+    excess = 0.0
+    if amount > total_debt + TOLERANCE:
+        if not allow_excess:
+            raise AmountExceedsDebtError(total_debt)
+        excess = amount - total_debt
+    paid = min(amount, total_debt)
+
+    # Debts covered in full, then at most one partly paid debt
+    remaining = paid
+    fully_paid_ids = []
+    partial = None
+    for debt in debts:
+        if remaining <= TOLERANCE:
+            break
+        if debt.amount <= remaining + TOLERANCE:
+            fully_paid_ids.append(debt.id)
+            remaining -= debt.amount
+        else:
+            partial = debt
+            break
+
+    settled_debt_ids = list(fully_paid_ids)
+    if fully_paid_ids:
+        await db.execute(
+            update(Debt)
+            .where(Debt.id.in_(fully_paid_ids))
+            .values(status=DebtStatus.SETTLED)
+            .execution_options(synchronize_session=False)
+        )
+
+    partially_paid = None
+    if partial is not None:
+        await db.execute(
+            update(Debt)
+            .where(Debt.id == partial.id)
+            .values(amount=Debt.amount - remaining)
+            .execution_options(synchronize_session=False)
+        )
+        settled_part = Debt(
+            debtor_id=debtor_id,
+            creditor_id=creditor_id,
+            amount=remaining,
+            status=DebtStatus.SETTLED,
+            created_at=partial.created_at
+        )
+        db.add(settled_part)
+        await db.flush()
+        settled_debt_ids.append(settled_part.id)
+        partially_paid = {
+            "debt_id": partial.id,
+            "paid": remaining,
+            "remaining": partial.amount - remaining
+        }
+
+    await apply_debt_change(db, debtor_id, creditor_id, -paid)
+
+    reverse_debt_id = None
+    if excess > 0:
+        reverse_debt = Debt(
+            debtor_id=creditor_id,
+            creditor_id=debtor_id,
+            amount=excess,
+            status=DebtStatus.ACTIVE
+        )
+        db.add(reverse_debt)
+        await db.flush()
+        await apply_debt_change(db, creditor_id, debtor_id, excess)
+        reverse_debt_id = reverse_debt.id
+
+    return {
+        "total_debt": total_debt,
+        "paid": paid,
+        "excess": excess,
+        "settled_debt_ids": settled_debt_ids,
+        "partially_paid": partially_paid,
+        "reverse_debt_id": reverse_debt_id,
+        "remaining_debt": total_debt - paid
+    }
@@ -0,0 +1,68 @@
+from typing import Dict, List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import Debt, DebtStatus
+from app.ledger.balances import apply_debt_change
+
+
+class InvalidSplitError(ValueError):
+    """Shares that do not add up to the expense or name unknown participants"""
+
+
+def _to_cents(amount: float) -> int:
+    return round(amount * 100)
+
+
+def split_equally(amount: float, participant_ids: List[int]) -> Dict[int, float]:
+    """
+    Equal shares of amount, exact to the cent
+
+    Leftover cents go one each to the first participants, so the shares
+    always add up to amount ("100 TL / 3" -> 33.34, 33.33, 33.33).
+    """
+    if not participant_ids:
+        raise InvalidSplitError("An expense needs at least one participant")
+    participant_ids = list(dict.fromkeys(participant_ids))
+    base, leftover = divmod(_to_cents(amount), len(participant_ids))
+    return {
+        user_id: (base + (1 if i < leftover else 0)) / 100
+        for i, user_id in enumerate(participant_ids)
+    }
+
+
+def validate_shares(amount: float, shares: Dict[int, float], participant_ids: Optional[List[int]] = None) -> Dict[int, float]:
+    """
+    Check custom shares: none negative, all for participants, summing to amount
+
+    Returns:
+        dict: The shares rounded to the cent
+    """
+    if any(share < 0 for share in shares.values()):
+        raise InvalidSplitError("Shares cannot be negative")
+    if participant_ids is not None:
+        unknown = set(shares) - set(participant_ids)
+        if unknown:
+            raise InvalidSplitError(f"Users {sorted(unknown)} are not participants of this expense")
+    if sum(_to_cents(share) for share in shares.values()) != _to_cents(amount):
+        raise InvalidSplitError(f"Shares must add up to the expense amount ({amount} TL)")
+    return {user_id: _to_cents(share) / 100 for user_id, share in shares.items()}
+
+
+async def add_expense_debts(db: AsyncSession, payer_id: int, shares: Dict[int, float]) -> List[Debt]:
+    """
+    Create a debt to the payer for every other participant's share
+
+    Balance rows are updated in the same transaction; the caller commits.
+
+    Returns:
+        list: The new debts (flushed, so they have ids)
+    """
+    debts = [
+        Debt(debtor_id=user_id, creditor_id=payer_id, amount=share, status=DebtStatus.ACTIVE)
+        for user_id, share in shares.items()
+        if user_id != payer_id and share > 0
+    ]
+    db.add_all(debts)
+    await db.flush()
+    for debt in debts:
+        await apply_debt_change(db, debt.debtor_id, payer_id, debt.amount)
+    return debts
@@ -1,9 +1,11 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float, Text, ForeignKey, JSON, Enum as SQLEnum
+from sqlalchemy import BigInteger, Column, Integer, String, DateTime, Float, Text, ForeignKey, JSON, Index, Enum as SQLEnum, text
+from sqlalchemy import DDL, event, literal_column
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from datetime import datetime
 import enum
 from app.database import Base
+from app.ai.text import item_key as make_item_key
 
 
 class TaskStatus(str, enum.Enum):
@@ -14,12 +16,35 @@ class TaskStatus(str, enum.Enum):
     CANCELLED = "cancelled"
 
 
+# PostgreSQL text search configuration for message content. Queries must use
+# search_vector() so their expression matches ix_messages_content_fts.
+SEARCH_TEXT_CONFIG = "turkish"
+
+
+def search_vector(column):
+    """to_tsvector expression for a text column (PostgreSQL)"""
+    return func.to_tsvector(literal_column(f"'{SEARCH_TEXT_CONFIG}'"), column)
+
+
 class DebtStatus(str, enum.Enum):
     """Debt status enumeration"""
     ACTIVE = "active"
     SETTLED = "settled"
 
 
+def username_key(column, collate: bool = True):
+    """
+    Case-insensitive sort and prefix-search key of a username
+
+    Directory queries must use the same expression so ix_users_username_key
+    applies. On PostgreSQL it is collated "C": byte order makes prefix
+    ranges exact and lets the index serve both the range and ORDER BY.
+    SQLite has no "C" collation but compares bytes by default.
+    """
+    key = func.lower(column)
+    return key.collate("C") if collate else key
+
+
 class User(Base):
     """User model"""
     __tablename__ = "users"
@@ -38,6 +63,12 @@ class User(Base):
     expenses = relationship("Expense", back_populates="payer")
     debts_owed = relationship("Debt", foreign_keys="Debt.debtor_id", back_populates="debtor")
     debts_to_collect = relationship("Debt", foreign_keys="Debt.creditor_id", back_populates="creditor")
+    
+    __table_args__ = (
+        # User directory: case-insensitive prefix search and ordering by name
+        Index("ix_users_username_key", username_key(username), "id").ddl_if(dialect="postgresql"),
+        Index("ix_users_username_key_sqlite", username_key(username, collate=False), "id").ddl_if(dialect="sqlite"),
+    )
 
 
 class Message(Base):
@@ -49,12 +80,54 @@ class Message(Base):
     receiver_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     content = Column(Text, nullable=False)
     ai_analysis = Column(JSON, nullable=True)  # Stores AI analysis result
+    # Analysis queue bookkeeping (app.ai.queue): attempts so far, and until
+    # when a worker holds the message or its next retry is due
+    analysis_attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    analysis_claimed_until = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
     sender = relationship("User", foreign_keys=[sender_id], back_populates="sent_messages")
     receiver = relationship("User", foreign_keys=[receiver_id], back_populates="received_messages")
     task = relationship("Task", back_populates="triggering_message", uselist=False)
+    
+    __table_args__ = (
+        # Conversation history in both directions, newest first
+        Index("ix_messages_sender_receiver_created", "sender_id", "receiver_id", "created_at"),
+        Index("ix_messages_receiver_sender_created", "receiver_id", "sender_id", "created_at"),
+        # Messages still waiting for AI analysis
+        Index(
+            "ix_messages_pending_analysis", "id",
+            postgresql_where=text("ai_analysis IS NULL"),
+            sqlite_where=text("ai_analysis IS NULL")
+        ),
+        # Full-text search over content (SQLite uses messages_fts below)
+        Index(
+            "ix_messages_content_fts", search_vector(content),
+            postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+    )
+
+
+# SQLite full-text index: an external-content FTS5 table kept in sync by triggers
+_SQLITE_FTS_DDL = [
+    """CREATE VIRTUAL TABLE messages_fts USING fts5(
+        content, content='messages', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER messages_fts_insert AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+    """CREATE TRIGGER messages_fts_delete AFTER DELETE ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END""",
+    """CREATE TRIGGER messages_fts_update AFTER UPDATE OF content ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+]
+for _statement in _SQLITE_FTS_DDL:
+    event.listen(Message.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+event.listen(Message.__table__, "before_drop", DDL("DROP TABLE IF EXISTS messages_fts").execute_if(dialect="sqlite"))
 
 
 class Task(Base):
@@ -65,6 +138,12 @@ class Task(Base):
     created_by = Column(Integer, ForeignKey("users.id"), nullable=False)
     assigned_to = Column(Integer, ForeignKey("users.id"), nullable=False)
     item_name = Column(String(200), nullable=False)
+    # Normalized, stemmed item_name used to match expenses (app.ai.matching)
+    item_key = Column(
+        String(200),
+        default=lambda context: make_item_key(context.get_current_parameters()["item_name"]),
+        nullable=True
+    )
     status = Column(SQLEnum(TaskStatus), default=TaskStatus.PENDING, nullable=False)
     related_message_id = Column(Integer, ForeignKey("messages.id"), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -75,6 +154,17 @@ class Task(Base):
     assignee = relationship("User", foreign_keys=[assigned_to], back_populates="assigned_tasks")
     triggering_message = relationship("Message", back_populates="task")
     expenses = relationship("Expense", back_populates="task")
+    
+    __table_args__ = (
+        Index("ix_tasks_created_by_status_created", "created_by", "status", "created_at"),
+        Index("ix_tasks_assigned_to_status_created", "assigned_to", "status", "created_at"),
+        # Open tasks between two users, for matching expenses
+        Index(
+            "ix_tasks_open_pair", "created_by", "assigned_to",
+            postgresql_where=text("status IN ('PENDING', 'IN_PROGRESS')"),
+            sqlite_where=text("status IN ('PENDING', 'IN_PROGRESS')")
+        ),
+    )
 
 
 class Expense(Base):
@@ -85,6 +175,7 @@ class Expense(Base):
     task_id = Column(Integer, ForeignKey("tasks.id"), nullable=False)
     paid_by = Column(Integer, ForeignKey("users.id"), nullable=False)
     amount = Column(Float, nullable=False)
+    group_id = Column(Integer, ForeignKey("groups.id"), nullable=True)  # Set for group expenses
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
@@ -92,6 +183,36 @@ class Expense(Base):
     payer = relationship("User", back_populates="expenses")
 
 
+class Group(Base):
+    """Group of users sharing expenses (a flat, a trip)"""
+    __tablename__ = "groups"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(100), nullable=False)
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Relationships
+    members = relationship("GroupMember", back_populates="group", cascade="all, delete-orphan")
+
+
+class GroupMember(Base):
+    """Membership of a user in a group"""
+    __tablename__ = "group_members"
+    
+    group_id = Column(Integer, ForeignKey("groups.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    joined_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Relationships
+    group = relationship("Group", back_populates="members")
+    
+    __table_args__ = (
+        # Groups of a user
+        Index("ix_group_members_user", "user_id"),
+    )
+
+
 class Debt(Base):
     """Debt model"""
     __tablename__ = "debts"
@@ -106,4 +227,124 @@ class Debt(Base):
     # Relationships
     debtor = relationship("User", foreign_keys=[debtor_id], back_populates="debts_owed")
     creditor = relationship("User", foreign_keys=[creditor_id], back_populates="debts_to_collect")
+    
+    __table_args__ = (
+        # Active debts of a pair, oldest first (payments, settlement, balances)
+        Index(
+            "ix_debts_active_debtor_creditor_created", "debtor_id", "creditor_id", "created_at",
+            postgresql_where=text("status = 'ACTIVE'"),
+            sqlite_where=text("status = 'ACTIVE'")
+        ),
+        # Active debts owed to a user (total balance)
+        Index(
+            "ix_debts_active_creditor", "creditor_id", "debtor_id",
+            postgresql_where=text("status = 'ACTIVE'"),
+            sqlite_where=text("status = 'ACTIVE'")
+        ),
+        # Debt history, newest first
+        Index("ix_debts_debtor_created", "debtor_id", "created_at"),
+        Index("ix_debts_creditor_created", "creditor_id", "created_at"),
+    )
+
+
 
+class AnalysisCacheEntry(Base):
+    """Persisted AI analysis result, keyed by normalized message text"""
+    __tablename__ = "analysis_cache"
+    
+    key = Column(String(200), primary_key=True)
+    result = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class Balance(Base):
+    """
+    Running totals of active debts between two users
+    
+    One row per pair, with user_a < user_b. Updated in the same transaction
+    as every debt insert, settlement and payment (see app.ledger.balances).
+    """
+    __tablename__ = "balances"
+    
+    user_a = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    user_b = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    a_owes = Column(Float, nullable=False, default=0.0)  # Active debts of user_a to user_b
+    b_owes = Column(Float, nullable=False, default=0.0)  # Active debts of user_b to user_a
+    net_amount = Column(Float, nullable=False, default=0.0)  # b_owes - a_owes; positive if user_a should receive
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        Index("ix_balances_user_b", "user_b"),
+    )
+
+
+class DebtCompaction(Base):
+    """
+    Audit record of netting a pair's active debts into at most one debt
+    
+    The debts that were replaced are kept in debts_archive with this
+    compaction's id (see app.ledger.compaction).
+    """
+    __tablename__ = "debt_compactions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_a = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_b = Column(Integer, ForeignKey("users.id"), nullable=False)
+    debt_count = Column(Integer, nullable=False)  # Active debts that were netted
+    a_owed = Column(Float, nullable=False)  # What user_a owed user_b before netting
+    b_owed = Column(Float, nullable=False)  # What user_b owed user_a before netting
+    result_debt_id = Column(Integer, nullable=True)  # The remaining debt; None if the pair came out even
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ArchivedDebt(Base):
+    """
+    Settled or netted debt moved out of the debts table
+    
+    Keeps the id it had in debts, so ids stay unique across both tables.
+    """
+    __tablename__ = "debts_archive"
+    
+    id = Column(Integer, primary_key=True)
+    debtor_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    creditor_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    amount = Column(Float, nullable=False)
+    status = Column(SQLEnum(DebtStatus), nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=True)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+    compaction_id = Column(Integer, ForeignKey("debt_compactions.id"), nullable=True)  # Set if netted, None if paid
+    
+    __table_args__ = (
+        # Debt history, newest first
+        Index("ix_debts_archive_debtor_created", "debtor_id", "created_at"),
+        Index("ix_debts_archive_creditor_created", "creditor_id", "created_at"),
+    )
+
+
+class DataVersion(Base):
+    """
+    Change counter behind the ETags of polled endpoints
+    
+    One row per (scope, owner_id), incremented in the same transaction as
+    every change to the data it covers (see app.versions). owner_id is a
+    user id, or 0 for scopes shared by all users.
+    """
+    __tablename__ = "data_versions"
+    
+    scope = Column(String(20), primary_key=True)
+    owner_id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class BrokerPayload(Base):
+    """
+    WebSocket event too large for a NOTIFY payload (PostgreSQL broker)
+    
+    The sending node stores the event here and only notifies its id; the
+    other nodes read it back. Rows are deleted after a few minutes.
+    """
+    __tablename__ = "broker_payloads"
+    
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    payload = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
@@ -0,0 +1,113 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+from fastapi import HTTPException, status
+from sqlalchemy import Select, func, select, tuple_
+
+
+def _encode(values: list) -> str:
+    """Opaque, URL-safe encoding of the sort key of a row"""
+    raw = json.dumps(values).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode(cursor: str) -> list:
+    """Inverse of _encode; invalid cursors are a 400"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != 2:
+            raise ValueError(cursor)
+        return values
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Opaque cursor pointing just after the given row"""
+    return _encode([created_at.isoformat(), row_id])
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Parse a cursor from encode_cursor"""
+    created_at, row_id = _decode(cursor)
+    try:
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def encode_rank_cursor(rank: float, row_id: int) -> str:
+    """Cursor for result lists ordered by (rank, id) instead of time"""
+    return _encode([rank, row_id])
+
+
+def decode_rank_cursor(cursor: str) -> Tuple[float, int]:
+    """Parse a cursor from encode_rank_cursor"""
+    rank, row_id = _decode(cursor)
+    try:
+        return float(rank), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def encode_key_cursor(key: str, row_id: int) -> str:
+    """Cursor for result lists ordered by (text key, id) ascending"""
+    return _encode([key, row_id])
+
+
+def decode_key_cursor(cursor: str) -> Tuple[str, int]:
+    """Parse a cursor from encode_key_cursor"""
+    key, row_id = _decode(cursor)
+    try:
+        if not isinstance(key, str):
+            raise TypeError(key)
+        return key, int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def paginate(query: Select, model: Any, cursor: Optional[str], limit: int) -> Select:
+    """
+    Newest-first keyset page of query
+
+    model is a mapped class or the columns (.c) of a subquery with
+    created_at and id. Orders by (created_at, id) descending and continues
+    strictly after the cursor row, so the cost of a page does not depend
+    on how deep it is and rows inserted meanwhile do not shift later
+    pages. One extra row is fetched to tell whether there is a next page
+    (see page_items).
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        # Compare against the stored timestamp of the cursor row where it still
+        # exists: a round-tripped datetime can differ from the stored value in
+        # precision or text format (SQLite), which would repeat or skip rows
+        cursor_created_at = func.coalesce(
+            select(model.created_at).where(model.id == row_id).correlate(None).scalar_subquery(),
+            created_at
+        )
+        query = query.where(tuple_(model.created_at, model.id) < tuple_(cursor_created_at, row_id))
+    return query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)
+
+
+def page_items(rows: List[Any], limit: int) -> dict:
+    """Split the rows of a paginate() query into items and next_cursor"""
+    items = list(rows[:limit])
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return {"items": items, "next_cursor": next_cursor}
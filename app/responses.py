@@ -0,0 +1,71 @@
+import hashlib
+from typing import Any, List, Type
+import orjson
+from fastapi import Request
+from fastapi.responses import Response
+from pydantic import BaseModel
+from app.config import settings
+from app.pagination import page_items
+
+
+class FastJSONResponse(Response):
+    """
+    JSON response encoded with orjson
+
+    For list endpoints that select plain rows instead of ORM objects:
+    returning it skips response_model validation, so the rows must already
+    have the schema's columns (see response_columns). The response_model
+    is still declared on the route for the OpenAPI docs. UTC datetimes are
+    written with a Z suffix, like Pydantic does.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+
+
+def response_columns(schema: Type[BaseModel], model: Any) -> list:
+    """Columns of model named like the fields of schema, in field order"""
+    return [getattr(model, name) for name in schema.model_fields]
+
+
+def page_response(rows: List[Any], limit: int) -> FastJSONResponse:
+    """Response with a Page of the rows of a paginate() query"""
+    page = page_items(rows, limit)
+    page["items"] = [row._asdict() for row in page["items"]]
+    return FastJSONResponse(page)
+
+
+def make_etag(request: Request, *versions: Any) -> str:
+    """
+    Weak ETag for a response built from data at the given versions
+
+    Also covers the path and query string, so every filter and page of an
+    endpoint has its own tag, and the app version, so a deploy that changes
+    the response format invalidates cached copies.
+    """
+    raw = "|".join([settings.APP_VERSION, request.url.path, request.url.query, *map(str, versions)])
+    return f'W/"{hashlib.blake2b(raw.encode(), digest_size=12).hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the client's If-None-Match already names etag (weak comparison)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+
+def set_etag(response: Response, etag: str) -> Response:
+    """Attach etag; clients may keep the response but must revalidate it"""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def not_modified(etag: str) -> Response:
+    """304 answer for a client whose copy is current"""
+    return set_etag(Response(status_code=304), etag)
@@ -1,8 +1,16 @@
 from pydantic import BaseModel, EmailStr, Field
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Generic, TypeVar
 from app.models import TaskStatus, DebtStatus
 
+T = TypeVar("T")
+
+
+# Pagination Schema
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None  # Pass as ?cursor= for the next page; None on the last page
+
 
 # User Schemas
 class UserBase(BaseModel):
@@ -22,6 +30,10 @@ class UserResponse(UserBase):
         from_attributes = True
 
 
+class UserDirectoryEntry(UserResponse):
+    online: bool = False
+
+
 class UserLogin(BaseModel):
     username: str
     password: str
@@ -35,6 +47,8 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     username: Optional[str] = None
+    user_id: Optional[int] = None  # Missing in tokens issued before the uid claim
+    exp: Optional[int] = None
 
 
 # Message Schemas
@@ -55,6 +69,10 @@ class MessageResponse(BaseModel):
         from_attributes = True
 
 
+class MessageSearchResult(MessageResponse):
+    rank: float  # Higher is a better match
+
+
 # AI Analysis Schema
 class AIAnalysis(BaseModel):
     type: str  # "task", "expense", "normal"
@@ -134,7 +152,58 @@ class DebtBalance(BaseModel):
     net_balance: float  # Positive if they should receive, negative if they owe
 
 
+class CounterpartyBalance(BaseModel):
+    user_id: int  # The other user
+    username: str
+    total_owed: float  # What the current user owes them
+    total_to_collect: float  # What they owe the current user
+    net_balance: float  # Positive if the current user should receive
+
+
+class SettleTransfer(BaseModel):
+    from_user_id: int
+    from_username: Optional[str] = None
+    to_user_id: int
+    to_username: Optional[str] = None
+    amount: float
+
+
+class SettlePlan(BaseModel):
+    transfers: List[SettleTransfer]
+    transfer_count: int  # Transfers needed with the plan
+    debt_count: int  # Pairs that currently owe each other
+
+
 class SettleDebtRequest(BaseModel):
     creditor_id: int
     amount: float = Field(..., gt=0)
 
+
+
+# Group Schemas
+class GroupCreate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=100)
+    member_ids: List[int] = []  # The creator is always a member
+
+
+class GroupResponse(BaseModel):
+    id: int
+    name: str
+    created_by: int
+    member_ids: List[int]
+    created_at: datetime
+
+
+class GroupExpenseCreate(BaseModel):
+    item_name: str = Field(..., min_length=1, max_length=200)
+    amount: float = Field(..., gt=0)
+    participant_ids: Optional[List[int]] = None  # Defaults to every member, payer included
+    shares: Optional[Dict[int, float]] = None  # Custom split (user_id -> amount); equal split if omitted
+
+
+class GroupExpenseResponse(BaseModel):
+    expense_id: int
+    task_id: int
+    amount: float
+    shares: Dict[int, float]
+    debt_ids: List[int]
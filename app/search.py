@@ -0,0 +1,88 @@
+import re
+from typing import List, Optional
+from sqlalchemy import Float, and_, func, or_, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import Message, search_vector, SEARCH_TEXT_CONFIG
+from app.pagination import decode_rank_cursor, encode_rank_cursor
+from app.ai.text import turkish_lower
+
+_WORD_RE = re.compile(r"\w+")
+
+# Upper bound on query words; longer queries rarely help ranking
+MAX_QUERY_WORDS = 10
+
+
+def _query_words(q: str) -> List[str]:
+    """Lowercased words of a search query"""
+    return _WORD_RE.findall(turkish_lower(q))[:MAX_QUERY_WORDS]
+
+
+def _conversation_filter(user_id: int, other_user_id: Optional[int]):
+    """Messages the user sent or received, optionally with one other user only"""
+    if other_user_id:
+        return or_(
+            and_(Message.sender_id == user_id, Message.receiver_id == other_user_id),
+            and_(Message.sender_id == other_user_id, Message.receiver_id == user_id)
+        )
+    return or_(Message.sender_id == user_id, Message.receiver_id == user_id)
+
+
+def _postgres_query(words: List[str]):
+    """Ranked search with the GIN-indexed tsvector expression"""
+    ts_query = func.plainto_tsquery(text(f"'{SEARCH_TEXT_CONFIG}'"), " ".join(words))
+    vector = search_vector(Message.content)
+    rank = func.ts_rank_cd(vector, ts_query)
+    return select(Message, rank).where(vector.op("@@")(ts_query)), rank
+
+
+def _sqlite_query(words: List[str]):
+    """Ranked search with the FTS5 table; every word must match as a prefix"""
+    match = " ".join(f'"{word}"*' for word in words)
+    fts = text("SELECT rowid, -bm25(messages_fts) AS rank FROM messages_fts WHERE messages_fts MATCH :match")
+    fts = fts.bindparams(match=match).columns(rowid=Message.id.type, rank=Float()).subquery("fts")
+    return select(Message, fts.c.rank).join(fts, fts.c.rowid == Message.id), fts.c.rank
+
+
+async def search_messages(
+    db: AsyncSession,
+    user_id: int,
+    q: str,
+    limit: int,
+    cursor: Optional[str] = None,
+    other_user_id: Optional[int] = None
+) -> dict:
+    """
+    Full-text search in the user's conversations, best match first
+
+    Uses a GIN index over to_tsvector on PostgreSQL and an FTS5 table on
+    SQLite. Pages continue after a (rank, id) cursor.
+
+    Returns:
+        dict: items (messages with a rank attribute) and next_cursor
+    """
+    words = _query_words(q)
+    if not words:
+        return {"items": [], "next_cursor": None}
+
+    if db.bind.dialect.name == "postgresql":
+        query, rank = _postgres_query(words)
+    else:
+        query, rank = _sqlite_query(words)
+
+    query = query.where(_conversation_filter(user_id, other_user_id))
+    if cursor:
+        cursor_rank, cursor_id = decode_rank_cursor(cursor)
+        query = query.where(tuple_(rank, Message.id) < tuple_(cursor_rank, cursor_id))
+
+    result = await db.execute(query.order_by(rank.desc(), Message.id.desc()).limit(limit + 1))
+    rows = result.all()
+
+    items = []
+    for message, message_rank in rows[:limit]:
+        message.rank = float(message_rank)
+        items.append(message)
+
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_rank_cursor(items[-1].rank, items[-1].id)
+    return {"items": items, "next_cursor": next_cursor}
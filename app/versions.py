@@ -0,0 +1,58 @@
+from typing import Iterable
+from sqlalchemy import event, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import DataVersion, Task
+
+# Scopes; each one is bumped by every write that changes what its endpoints return
+TASKS = "tasks"  # Per user: tasks created by or assigned to them
+DEBTS = "debts"  # Per user: debts, archived debts and balances they are part of
+USERS = "users"  # Shared (owner 0): the user directory
+
+SHARED_OWNER = 0
+
+
+def _bump_statement(dialect_name: str, scope: str, owner_ids: Iterable[int]):
+    """Upsert that adds 1 to the counters of scope for owner_ids"""
+    insert = pg_insert if dialect_name == "postgresql" else sqlite_insert
+    # Sorted, so concurrent transactions lock the rows in the same order
+    statement = insert(DataVersion).values([
+        {"scope": scope, "owner_id": owner_id, "version": 1}
+        for owner_id in sorted(set(owner_ids))
+    ])
+    return statement.on_conflict_do_update(
+        index_elements=[DataVersion.scope, DataVersion.owner_id],
+        set_={"version": DataVersion.version + 1}
+    )
+
+
+async def bump_versions(db: AsyncSession, scope: str, owner_ids: Iterable[int]):
+    """
+    Mark data of scope as changed for owner_ids
+
+    Runs in the caller's transaction, so the new version becomes visible
+    together with the change itself; the caller commits.
+    """
+    owner_ids = list(owner_ids)
+    if owner_ids:
+        await db.execute(_bump_statement(db.bind.dialect.name, scope, owner_ids))
+
+
+async def get_version(db: AsyncSession, scope: str, owner_id: int = SHARED_OWNER) -> int:
+    """Current version of scope for owner_id (0 if it never changed)"""
+    result = await db.execute(
+        select(DataVersion.version).where(DataVersion.scope == scope, DataVersion.owner_id == owner_id)
+    )
+    return result.scalar_one_or_none() or 0
+
+
+# Tasks are only written through the ORM, so mapper events catch every change
+@event.listens_for(Task, "after_insert")
+@event.listens_for(Task, "after_update")
+@event.listens_for(Task, "after_delete")
+def _bump_task_versions(mapper, connection, target):
+    """Bump the task versions of both users of a changed task in the flush"""
+    owner_ids = {target.created_by, target.assigned_to} - {None}
+    if owner_ids:
+        connection.execute(_bump_statement(connection.dialect.name, TASKS, owner_ids))
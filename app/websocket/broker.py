@@ -0,0 +1,363 @@
+import asyncio
+import json
+import time
+import uuid
+from typing import Callable, Dict, Iterable, Optional, Set
+from sqlalchemy.engine import make_url
+from app.config import settings
+
+# Called with (user_id, message) for messages published by other nodes
+DeliverCallback = Callable[[int, dict], None]
+# Returns the user ids connected to this node
+LocalUsersCallback = Callable[[], Iterable[int]]
+
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes or more; larger events
+# go through the broker_payloads table
+MAX_NOTIFY_PAYLOAD = 7900
+# Stored events are read back within milliseconds; this only bounds the table
+PAYLOAD_RETENTION_SECONDS = 300
+# Backoff between attempts to reopen lost broker connections
+RECONNECT_MIN_DELAY = 1.0
+RECONNECT_MAX_DELAY = 30.0
+# User ids per heartbeat event, keeping each payload under the limit
+HEARTBEAT_CHUNK_SIZE = 500
+
+
+class Broker:
+    """
+    Delivers WebSocket messages between worker processes and nodes
+
+    ConnectionManager always delivers to its own connections directly and
+    only publishes through the broker for users that are online elsewhere.
+    """
+
+    def __init__(self):
+        self.node_id = uuid.uuid4().hex
+        # Increases whenever the known presence of remote users changes
+        self.presence_version = 0
+
+    async def start(self, deliver: DeliverCallback, local_users: LocalUsersCallback):
+        """Start receiving messages from other nodes"""
+
+    async def stop(self):
+        """Stop receiving messages"""
+
+    def publish(self, user_id: int, message: dict):
+        """Send a message to the user's connections on other nodes (non-blocking)"""
+
+    def set_presence(self, user_id: int, online: bool):
+        """Announce that a user connected to or left this node (non-blocking)"""
+
+    def is_remote_online(self, user_id: int) -> bool:
+        """Check if a user is connected to another node"""
+        return False
+
+    def remote_online(self, user_ids: Iterable[int]) -> Set[int]:
+        """The users among user_ids that are connected to another node"""
+        return set()
+
+
+class InMemoryBroker(Broker):
+    """Single-process broker: every connection is local, so there is nothing to forward"""
+
+
+class PostgresBroker(Broker):
+    """
+    Broker built on PostgreSQL LISTEN/NOTIFY
+
+    All nodes listen on one channel. Presence is shared with "online" and
+    "offline" events plus a periodic heartbeat listing each node's users;
+    entries that miss three heartbeats (e.g. a crashed node) expire.
+
+    Events too large for NOTIFY are stored in broker_payloads and only
+    their id is notified. If either connection drops (or nothing, not even
+    our own heartbeat, arrives for three heartbeats), both are reopened
+    with backoff and presence is exchanged again; events published in the
+    meantime wait in the outbox.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        channel: str = settings.WS_BROKER_CHANNEL,
+        heartbeat_seconds: float = settings.WS_PRESENCE_HEARTBEAT_SECONDS
+    ):
+        super().__init__()
+        self.dsn = dsn
+        self.channel = channel
+        self.heartbeat_seconds = heartbeat_seconds
+        self._listen_conn = None
+        self._notify_conn = None
+        self._connected = asyncio.Event()
+        self._lost = asyncio.Event()
+        self._last_received = 0.0
+        self._last_cleanup = 0.0
+        self._outbox: Optional[asyncio.Queue] = None
+        self._inbox: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self._deliver: Optional[DeliverCallback] = None
+        self._local_users: Optional[LocalUsersCallback] = None
+        # user_id -> {node_id: last seen (monotonic)}
+        self._remote_presence: Dict[int, Dict[str, float]] = {}
+
+    async def start(self, deliver: DeliverCallback, local_users: LocalUsersCallback):
+        """Open the LISTEN and NOTIFY connections and announce this node"""
+        self._deliver = deliver
+        self._local_users = local_users
+        self._outbox = asyncio.Queue()
+        self._inbox = asyncio.Queue()
+
+        await self._connect()
+
+        self._tasks = [
+            asyncio.create_task(self._sender()),
+            asyncio.create_task(self._receiver()),
+            asyncio.create_task(self._heartbeat()),
+            asyncio.create_task(self._reconnector())
+        ]
+        self._emit({"kind": "hello"})
+        print(f"[BROKER] PostgreSQL broker started on channel '{self.channel}' (node {self.node_id[:8]})")
+
+    async def stop(self):
+        """Announce departure and close both connections"""
+        if self._connected.is_set():
+            try:
+                await self._notify(self._notify_conn, json.dumps({"node": self.node_id, "kind": "bye"}))
+            except Exception:
+                pass
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self._close_connections()
+
+    def publish(self, user_id: int, message: dict):
+        self._emit({"kind": "message", "user_id": user_id, "message": message})
+
+    def set_presence(self, user_id: int, online: bool):
+        self._emit({"kind": "online" if online else "offline", "user_id": user_id})
+
+    def is_remote_online(self, user_id: int) -> bool:
+        nodes = self._remote_presence.get(user_id)
+        if not nodes:
+            return False
+
+        cutoff = time.monotonic() - 3 * self.heartbeat_seconds
+        return any(last_seen >= cutoff for last_seen in nodes.values())
+
+    def remote_online(self, user_ids: Iterable[int]) -> Set[int]:
+        cutoff = time.monotonic() - 3 * self.heartbeat_seconds
+        online = set()
+        for user_id in user_ids:
+            nodes = self._remote_presence.get(user_id)
+            if nodes and any(last_seen >= cutoff for last_seen in nodes.values()):
+                online.add(user_id)
+        return online
+
+    async def _connect(self):
+        """Open both connections and LISTEN on the channel"""
+        import asyncpg
+
+        self._listen_conn = await asyncpg.connect(self.dsn)
+        self._notify_conn = await asyncpg.connect(self.dsn)
+        for conn in (self._listen_conn, self._notify_conn):
+            conn.add_termination_listener(self._on_connection_lost)
+        await self._listen_conn.add_listener(self.channel, self._on_notify)
+
+        self._last_received = time.monotonic()
+        self._connected.set()
+
+    async def _close_connections(self):
+        """Close both connections without reporting them as lost"""
+        self._connected.clear()
+        for conn in (self._listen_conn, self._notify_conn):
+            if conn is not None and not conn.is_closed():
+                try:
+                    await asyncio.wait_for(conn.close(), timeout=RECONNECT_MIN_DELAY)
+                except Exception:
+                    conn.terminate()
+        self._listen_conn = self._notify_conn = None
+
+    def _on_connection_lost(self, connection):
+        """Have the reconnector reopen both connections (if connection is a current one)"""
+        if self._connected.is_set() and connection in (self._listen_conn, self._notify_conn):
+            print("[BROKER] Connection to PostgreSQL lost, reconnecting")
+            self._connected.clear()
+            self._lost.set()
+
+    async def _reconnector(self):
+        """Reopen the connections with backoff whenever one is lost"""
+        while True:
+            await self._lost.wait()
+            self._lost.clear()
+            await self._close_connections()
+
+            delay = RECONNECT_MIN_DELAY
+            while True:
+                try:
+                    await self._connect()
+                    break
+                except Exception as e:
+                    print(f"[BROKER] Reconnect failed ({e!r}), retrying in {delay:.0f}s")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+            print("[BROKER] Reconnected to PostgreSQL")
+            # Presence changes may have been missed both ways: ask the other
+            # nodes for theirs and re-announce ours
+            self._emit({"kind": "hello"})
+            self._announce_local_users()
+
+    def _emit(self, event: dict):
+        """Queue an event for the sender task"""
+        if self._outbox is None:
+            return
+        self._outbox.put_nowait(json.dumps({"node": self.node_id, **event}, default=str))
+
+    async def _notify(self, conn, payload: str):
+        await asyncio.wait_for(
+            conn.execute("SELECT pg_notify($1, $2)", self.channel, payload),
+            timeout=self.heartbeat_seconds
+        )
+
+    async def _sender(self):
+        """Send queued events in order on the NOTIFY connection"""
+        while True:
+            payload = await self._outbox.get()
+            while True:
+                await self._connected.wait()
+                conn = self._notify_conn
+                try:
+                    if len(payload.encode()) > MAX_NOTIFY_PAYLOAD:
+                        payload = await self._store_payload(conn, payload)
+                    await self._notify(conn, payload)
+                    break
+                except Exception as e:
+                    if not (isinstance(e, asyncio.TimeoutError) or conn.is_closed()):
+                        print(f"[BROKER] NOTIFY failed, event dropped: {e!r}")
+                        break
+                    # Connection lost or hung: send the same event again once reconnected
+                    self._on_connection_lost(conn)
+
+    async def _store_payload(self, conn, payload: str) -> str:
+        """Save an oversized event and return the notification that points to it"""
+        payload_id = await conn.fetchval(
+            "INSERT INTO broker_payloads (payload) VALUES ($1) RETURNING id", payload
+        )
+
+        now = time.monotonic()
+        if now - self._last_cleanup > self.heartbeat_seconds:
+            self._last_cleanup = now
+            await conn.execute(
+                "DELETE FROM broker_payloads WHERE created_at < now() - make_interval(secs => $1)",
+                float(PAYLOAD_RETENTION_SECONDS)
+            )
+
+        return json.dumps({"node": self.node_id, "kind": "stored", "id": payload_id})
+
+    async def _heartbeat(self):
+        """Periodically re-announce this node's users, in payload-sized chunks"""
+        while True:
+            if self._connected.is_set():
+                if time.monotonic() - self._last_received > 3 * self.heartbeat_seconds:
+                    # Not even our own heartbeats come back: the LISTEN connection is dead
+                    self._on_connection_lost(self._listen_conn)
+                else:
+                    self._announce_local_users()
+            self._expire_presence()
+            await asyncio.sleep(self.heartbeat_seconds)
+
+    def _announce_local_users(self):
+        """Send this node's connected users as heartbeat events (at least one, as a liveness signal)"""
+        user_ids = list(self._local_users())
+        for i in range(0, max(len(user_ids), 1), HEARTBEAT_CHUNK_SIZE):
+            self._emit({"kind": "heartbeat", "user_ids": user_ids[i:i + HEARTBEAT_CHUNK_SIZE]})
+
+    def _expire_presence(self):
+        """Forget presence entries that missed three heartbeats"""
+        cutoff = time.monotonic() - 3 * self.heartbeat_seconds
+        for user_id in list(self._remote_presence):
+            nodes = self._remote_presence[user_id]
+            for node_id in [n for n, last_seen in nodes.items() if last_seen < cutoff]:
+                del nodes[node_id]
+                self.presence_version += 1
+            if not nodes:
+                del self._remote_presence[user_id]
+
+    def _on_notify(self, connection, pid, channel, payload: str):
+        """Queue an event from any node (including our own, as a liveness signal)"""
+        self._last_received = time.monotonic()
+        self._inbox.put_nowait(payload)
+
+    async def _receiver(self):
+        """Handle received events in order, reading stored ones back from the table"""
+        while True:
+            payload = await self._inbox.get()
+            try:
+                event = json.loads(payload)
+            except ValueError:
+                continue
+
+            if event.get("node") == self.node_id:
+                continue
+
+            if event.get("kind") == "stored":
+                payload = await self._read_stored(event["id"])
+                if payload is None:
+                    continue
+                event = json.loads(payload)
+
+            self._handle(event)
+
+    async def _read_stored(self, payload_id: int) -> Optional[str]:
+        """Read an oversized event back, waiting for a reconnect if needed"""
+        while True:
+            await self._connected.wait()
+            conn = self._listen_conn
+            try:
+                return await asyncio.wait_for(
+                    conn.fetchval("SELECT payload FROM broker_payloads WHERE id = $1", payload_id),
+                    timeout=self.heartbeat_seconds
+                )
+            except Exception as e:
+                if not (isinstance(e, asyncio.TimeoutError) or conn.is_closed()):
+                    print(f"[BROKER] Could not read stored event {payload_id}: {e!r}")
+                    return None
+                self._on_connection_lost(conn)
+
+    def _handle(self, event: dict):
+        """Apply an event from another node"""
+        node_id = event.get("node")
+        kind = event.get("kind")
+        now = time.monotonic()
+
+        if kind == "message":
+            self._deliver(event["user_id"], event["message"])
+        elif kind == "online":
+            self._remote_presence.setdefault(event["user_id"], {})[node_id] = now
+            self.presence_version += 1
+        elif kind == "offline":
+            if self._remote_presence.get(event["user_id"], {}).pop(node_id, None) is not None:
+                self.presence_version += 1
+        elif kind == "heartbeat":
+            for user_id in event["user_ids"]:
+                nodes = self._remote_presence.setdefault(user_id, {})
+                if node_id not in nodes:
+                    self.presence_version += 1
+                nodes[node_id] = now
+        elif kind == "hello":
+            # A new node joined: share our users right away instead of at the next heartbeat
+            self._announce_local_users()
+        elif kind == "bye":
+            for nodes in self._remote_presence.values():
+                nodes.pop(node_id, None)
+            self.presence_version += 1
+
+
+def create_broker() -> Broker:
+    """Create the broker selected by WS_BROKER"""
+    if settings.WS_BROKER == "postgres":
+        dsn = make_url(settings.DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+        return PostgresBroker(dsn)
+    return InMemoryBroker()
@@ -1,43 +1,43 @@
 from fastapi import WebSocket, WebSocketDisconnect
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import AsyncSessionLocal
 from app.models import User, Message
 from app.websocket.manager import manager
-from app.ai.analyzer import MessageAnalyzer
-from app.auth.jwt import verify_token
+from app.ai.queue import analysis_queue
+from app.auth.dependencies import authenticate_token
 import json
 
 
-async def handle_websocket_connection(websocket: WebSocket, token: str, db: Session):
+async def handle_websocket_connection(websocket: WebSocket, token: str):
     """
     Handle WebSocket connection and messages
     
+    No database session is held for the life of the socket: each inbound
+    frame gets a short-lived session from the pool that is returned as soon
+    as the frame has been processed.
+    
     Args:
         websocket: WebSocket connection
         token: JWT authentication token
-        db: Database session
     """
-    # Verify token and get user
-    token_data = verify_token(token)
-    if not token_data or not token_data.username:
+    # Verify token and get user (answered from the auth cache when possible)
+    async with AsyncSessionLocal() as db:
+        user = await authenticate_token(token, db)
+    if user is None:
         await websocket.close(code=1008, reason="Invalid token")
         return
-    
-    user = db.query(User).filter(User.username == token_data.username).first()
-    if not user:
-        await websocket.close(code=1008, reason="User not found")
-        return
+    user_id, username = user.id, user.username
     
     # Connect user
-    await manager.connect(websocket, user.id)
+    await manager.connect(websocket, user_id)
     
     # Send welcome message
     await manager.send_personal_message({
         "type": "system",
         "message": "Connected successfully",
-        "user_id": user.id,
-        "username": user.username
-    }, user.id)
+        "user_id": user_id,
+        "username": username
+    }, user_id)
     
     try:
         while True:
@@ -45,17 +45,24 @@ async def handle_websocket_connection(websocket: WebSocket, token: str, db: Sess
             data = await websocket.receive_text()
             message_data = json.loads(data)
             
-            # Process the message
-            await process_message(message_data, user, db)
+            # Process the message in its own unit of work
+            async with AsyncSessionLocal() as db:
+                sender = await db.get(User, user_id)
+                if sender is None:
+                    # The account was deleted while connected
+                    manager.disconnect(websocket, user_id)
+                    await websocket.close(code=1008, reason="User not found")
+                    return
+                await process_message(message_data, sender, db)
             
     except WebSocketDisconnect:
-        manager.disconnect(websocket, user.id)
+        manager.disconnect(websocket, user_id)
     except Exception as e:
-        print(f"WebSocket error for user {user.id}: {e}")
-        manager.disconnect(websocket, user.id)
+        print(f"WebSocket error for user {user_id}: {e}")
+        manager.disconnect(websocket, user_id)
 
 
-async def process_message(message_data: dict, sender: User, db: Session):
+async def process_message(message_data: dict, sender: User, db: AsyncSession):
     """
     Process a received message
     
@@ -77,7 +84,7 @@ async def process_message(message_data: dict, sender: User, db: Session):
             return
         
         # Get receiver
-        receiver = db.query(User).filter(User.id == receiver_id).first()
+        receiver = await db.get(User, receiver_id)
         if not receiver:
             await manager.send_personal_message({
                 "type": "error",
@@ -92,16 +99,10 @@ async def process_message(message_data: dict, sender: User, db: Session):
             content=content
         )
         db.add(new_message)
-        db.commit()
-        db.refresh(new_message)
+        await db.commit()
+        await db.refresh(new_message)
         
-        # Analyze message with AI and process
-        print(f"[DEBUG] Analyzing message: {content}")
-        analyzer = MessageAnalyzer(db)
-        analysis_result = analyzer.analyze_and_process(new_message, sender, receiver)
-        print(f"[DEBUG] Analysis result: {analysis_result['analysis']}")
-        
-        # Send message to both sender and receiver
+        # Phase 1: deliver the chat message as soon as it is stored
         chat_message = {
             "type": "message",
             "id": new_message.id,
@@ -111,96 +112,17 @@ async def process_message(message_data: dict, sender: User, db: Session):
             "receiver_username": receiver.username,
             "content": content,
             "created_at": new_message.created_at.isoformat(),
-            "ai_analysis": analysis_result["analysis"]
+            "ai_analysis": None
         }
         
         await manager.send_personal_message(chat_message, sender.id)
         if sender.id != receiver.id:
             await manager.send_personal_message(chat_message, receiver.id)
         
-        # Send task notification if a task was created
-        if analysis_result["analysis"]["type"] == "task" and analysis_result["task"]:
-            task_notification = {
-                "type": "notification",
-                "message": f"New task created: {analysis_result['task'].item_name}",
-                "task_id": analysis_result["task"].id if analysis_result["task"] else None
-            }
-            await manager.send_personal_message(task_notification, sender.id)
-            if sender.id != receiver.id:
-                await manager.send_personal_message(task_notification, receiver.id)
-        
-        elif analysis_result["analysis"]["type"] == "expense" and analysis_result["debt"]:
-            debt = analysis_result["debt"]
-            expense = analysis_result["expense"]
-            
-            # Notify debtor
-            await manager.send_personal_message({
-                "type": "notification",
-                "message": f"New debt: {debt.amount} TL to {sender.username}",
-                "debt_id": debt.id,
-                "amount": debt.amount
-            }, debt.debtor_id)
-            
-            # Notify creditor
-            await manager.send_personal_message({
-                "type": "notification",
-                "message": f"New credit: {debt.amount} TL from {receiver.username}",
-                "debt_id": debt.id,
-                "amount": debt.amount
-            }, debt.creditor_id)
-        
-        elif analysis_result["analysis"]["type"] == "payment" and analysis_result["payment"]:
-            payment = analysis_result["payment"]
-            
-            if payment["success"]:
-                # Build message for payer
-                payer_message = f"✅ {payment['paid_amount']} TL ödeme yaptınız."
-                if payment['remaining_total_debt'] > 0:
-                    payer_message += f" Kalan borç: {payment['remaining_total_debt']} TL"
-                else:
-                    payer_message += " Tüm borçlar kapandı!"
-                
-                if payment.get("reverse_debt_created"):
-                    payer_message += f" {receiver.username} size {payment['excess_amount']} TL borçlu."
-                
-                # Notify payer
-                await manager.send_personal_message({
-                    "type": "notification",
-                    "category": "payment",
-                    "message": payer_message,
-                    "paid_amount": payment["paid_amount"],
-                    "remaining_debt": payment["remaining_total_debt"],
-                    "excess_amount": payment.get("excess_amount", 0),
-                    "reverse_debt": payment.get("reverse_debt_created", False)
-                }, sender.id)
-                
-                # Build message for receiver
-                receiver_message = f"💰 {sender.username}, {payment['paid_amount']} TL ödeme yaptı."
-                if payment['remaining_total_debt'] > 0:
-                    receiver_message += f" Kalan alacak: {payment['remaining_total_debt']} TL"
-                else:
-                    receiver_message += " Tüm alacaklar kapandı!"
-                
-                if payment.get("reverse_debt_created"):
-                    receiver_message += f" Size {payment['excess_amount']} TL borcunuz var."
-                
-                # Notify receiver
-                await manager.send_personal_message({
-                    "type": "notification",
-                    "category": "payment",
-                    "message": receiver_message,
-                    "paid_amount": payment["paid_amount"],
-                    "remaining_debt": payment["remaining_total_debt"],
-                    "excess_amount": payment.get("excess_amount", 0),
-                    "reverse_debt": payment.get("reverse_debt_created", False)
-                }, receiver.id)
-            else:
-                # No debt found
-                await manager.send_personal_message({
-                    "type": "notification",
-                    "category": "payment",
-                    "message": payment["message"]
-                }, sender.id)
+        # Phase 2: analysis runs in the background queue, which pushes the
+        # result as a follow-up event via send_analysis_result
+        print(f"[DEBUG] Queueing message for analysis: {content}")
+        analysis_queue.enqueue(new_message.id)
     
     except Exception as e:
         print(f"Error processing message: {e}")
@@ -208,3 +130,108 @@ async def process_message(message_data: dict, sender: User, db: Session):
             "type": "error",
             "message": f"Error processing message: {str(e)}"
         }, sender.id)
+
+
+async def send_analysis_result(message_id: int, analysis_result: dict, sender: User, receiver: User):
+    """
+    Send the AI analysis of a delivered message and any resulting notifications
+    
+    Args:
+        message_id: ID of the analyzed message
+        analysis_result: Result of MessageAnalyzer.analyze_and_process
+        sender: Sender user object
+        receiver: Receiver user object
+    """
+    analysis_message = {
+        "type": "analysis",
+        "message_id": message_id,
+        "ai_analysis": analysis_result["analysis"]
+    }
+    
+    await manager.send_personal_message(analysis_message, sender.id)
+    if sender.id != receiver.id:
+        await manager.send_personal_message(analysis_message, receiver.id)
+    
+    # Send task notification if a task was created
+    if analysis_result["analysis"]["type"] == "task" and analysis_result["task"]:
+        task_notification = {
+            "type": "notification",
+            "message": f"New task created: {analysis_result['task'].item_name}",
+            "task_id": analysis_result["task"].id if analysis_result["task"] else None
+        }
+        await manager.send_personal_message(task_notification, sender.id)
+        if sender.id != receiver.id:
+            await manager.send_personal_message(task_notification, receiver.id)
+    
+    elif analysis_result["analysis"]["type"] == "expense" and analysis_result["debt"]:
+        debt = analysis_result["debt"]
+        expense = analysis_result["expense"]
+        
+        # Notify debtor
+        await manager.send_personal_message({
+            "type": "notification",
+            "message": f"New debt: {debt.amount} TL to {sender.username}",
+            "debt_id": debt.id,
+            "amount": debt.amount
+        }, debt.debtor_id)
+        
+        # Notify creditor
+        await manager.send_personal_message({
+            "type": "notification",
+            "message": f"New credit: {debt.amount} TL from {receiver.username}",
+            "debt_id": debt.id,
+            "amount": debt.amount
+        }, debt.creditor_id)
+    
+    elif analysis_result["analysis"]["type"] == "payment" and analysis_result["payment"]:
+        payment = analysis_result["payment"]
+        
+        if payment["success"]:
+            # Build message for payer
+            payer_message = f"✅ {payment['paid_amount']} TL ödeme yaptınız."
+            if payment['remaining_total_debt'] > 0:
+                payer_message += f" Kalan borç: {payment['remaining_total_debt']} TL"
+            else:
+                payer_message += " Tüm borçlar kapandı!"
+            
+            if payment.get("reverse_debt_created"):
+                payer_message += f" {receiver.username} size {payment['excess_amount']} TL borçlu."
+            
+            # Notify payer
+            await manager.send_personal_message({
+                "type": "notification",
+                "category": "payment",
+                "message": payer_message,
+                "paid_amount": payment["paid_amount"],
+                "remaining_debt": payment["remaining_total_debt"],
+                "excess_amount": payment.get("excess_amount", 0),
+                "reverse_debt": payment.get("reverse_debt_created", False)
+            }, sender.id)
+            
+            # Build message for receiver
+            receiver_message = f"💰 {sender.username}, {payment['paid_amount']} TL ödeme yaptı."
+            if payment['remaining_total_debt'] > 0:
+                receiver_message += f" Kalan alacak: {payment['remaining_total_debt']} TL"
+            else:
+                receiver_message += " Tüm alacaklar kapandı!"
+            
+            if payment.get("reverse_debt_created"):
+                receiver_message += f" Size {payment['excess_amount']} TL borcunuz var."
+            
+            # Notify receiver
+            await manager.send_personal_message({
+                "type": "notification",
+                "category": "payment",
+                "message": receiver_message,
+                "paid_amount": payment["paid_amount"],
+                "remaining_debt": payment["remaining_total_debt"],
+                "excess_amount": payment.get("excess_amount", 0),
+                "reverse_debt": payment.get("reverse_debt_created", False)
+            }, receiver.id)
+        else:
+            # No debt found
+            await manager.send_personal_message({
+                "type": "notification",
+                "category": "payment",
+                "message": payment["message"]
+            }, sender.id)
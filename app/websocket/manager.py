@@ -1,53 +1,174 @@
 from fastapi import WebSocket
-from typing import Dict, List
+from typing import Dict, Iterable, List, Optional, Set
+import asyncio
 import json
+from app.config import settings
+from app.websocket.broker import Broker, create_broker
 
 
 class ConnectionManager:
-    """Manages WebSocket connections"""
-    
-    def __init__(self):
+    """
+    Manages WebSocket connections
+
+    Every connection has its own bounded outbound queue drained by a
+    writer task, so fan-out only enqueues and never waits on the network.
+    Connections whose queue overflows or whose send stalls longer than
+    send_timeout are disconnected.
+
+    Users connected to other workers or nodes are reached through the
+    broker, which also shares presence so is_user_online works cluster-wide.
+    """
+
+    def __init__(
+        self,
+        queue_size: int = settings.WS_SEND_QUEUE_SIZE,
+        send_timeout: float = settings.WS_SEND_TIMEOUT_SECONDS,
+        broker: Optional[Broker] = None
+    ):
         # Dictionary mapping user_id to list of WebSocket connections
         self.active_connections: Dict[int, List[WebSocket]] = {}
-    
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self._outboxes: Dict[WebSocket, asyncio.Queue] = {}
+        self._writers: Dict[WebSocket, asyncio.Task] = {}
+        self._closers: Set[asyncio.Task] = set()  # Sockets being closed after eviction
+        self.broker = broker or create_broker()
+        self._presence_changes = 0  # Users coming online or going offline on this node
+        self.stats: Dict[str, int] = {
+            "sent": 0,
+            "send_errors": 0,
+            "evicted_overflow": 0,
+            "evicted_stalled": 0
+        }
+
+    async def start(self):
+        """Start receiving messages from other nodes"""
+        await self.broker.start(self._deliver_local, lambda: list(self.active_connections))
+
+    async def stop(self):
+        """Finish closing evicted sockets and stop the broker"""
+        await asyncio.gather(*self._closers, return_exceptions=True)
+        await self.broker.stop()
+
     async def connect(self, websocket: WebSocket, user_id: int):
         """Connect a new WebSocket for a user"""
         await websocket.accept()
-        
+
         if user_id not in self.active_connections:
             self.active_connections[user_id] = []
-        
+            self.broker.set_presence(user_id, True)
+            self._presence_changes += 1
+
         self.active_connections[user_id].append(websocket)
-    
+        self._outboxes[websocket] = asyncio.Queue(maxsize=self.queue_size)
+        self._writers[websocket] = asyncio.create_task(self._writer(websocket, user_id))
+
     def disconnect(self, websocket: WebSocket, user_id: int):
         """Disconnect a WebSocket for a user"""
         if user_id in self.active_connections:
             if websocket in self.active_connections[user_id]:
                 self.active_connections[user_id].remove(websocket)
-            
+
             # Remove user entry if no more connections
             if not self.active_connections[user_id]:
                 del self.active_connections[user_id]
-    
+                self.broker.set_presence(user_id, False)
+                self._presence_changes += 1
+
+        self._outboxes.pop(websocket, None)
+        writer = self._writers.pop(websocket, None)
+        if writer is not None and writer is not asyncio.current_task():
+            writer.cancel()
+
     async def send_personal_message(self, message: dict, user_id: int):
-        """Send a message to a specific user (all their connections)"""
-        if user_id in self.active_connections:
-            for connection in self.active_connections[user_id]:
-                try:
-                    await connection.send_json(message)
-                except Exception as e:
-                    print(f"Error sending message to user {user_id}: {e}")
-    
+        """Send a message to a specific user (all their connections, on every node)"""
+        self._deliver_local(user_id, message)
+        if self.broker.is_remote_online(user_id):
+            self.broker.publish(user_id, message)
+
     async def send_to_users(self, message: dict, user_ids: List[int]):
         """Send a message to multiple users"""
         for user_id in user_ids:
             await self.send_personal_message(message, user_id)
-    
+
     def is_user_online(self, user_id: int) -> bool:
-        """Check if a user is online"""
-        return user_id in self.active_connections and len(self.active_connections[user_id]) > 0
+        """Check if a user is online on any node"""
+        if user_id in self.active_connections and len(self.active_connections[user_id]) > 0:
+            return True
+        return self.broker.is_remote_online(user_id)
+
+    def online_users(self, user_ids: Iterable[int]) -> Set[int]:
+        """
+        The users among user_ids that are online on any node
+
+        One pass over the ids for a whole page of users: local connections
+        first, then the broker's presence for the rest.
+        """
+        user_ids = list(user_ids)
+        local = {user_id for user_id in user_ids if self.active_connections.get(user_id)}
+        remote = self.broker.remote_online(user_id for user_id in user_ids if user_id not in local)
+        return local | remote
+
+    @property
+    def presence_version(self) -> int:
+        """Increases whenever any user's online state as seen by this worker changes"""
+        return self._presence_changes + self.broker.presence_version
+
+    def connection_count(self) -> int:
+        """Number of open WebSocket connections on this worker"""
+        return len(self._outboxes)
+
+    def _deliver_local(self, user_id: int, message: dict):
+        """Queue a message on this node's connections for a user"""
+        for connection in list(self.active_connections.get(user_id, [])):
+            self._enqueue(connection, user_id, message)
+
+    def _enqueue(self, websocket: WebSocket, user_id: int, message: dict):
+        """Queue a message for one connection, evicting it if its queue is full"""
+        outbox = self._outboxes.get(websocket)
+        if outbox is None:
+            return
+
+        try:
+            outbox.put_nowait(message)
+        except asyncio.QueueFull:
+            self.stats["evicted_overflow"] += 1
+            print(f"[WS] Send queue full for user {user_id}, disconnecting slow client")
+            self._evict(websocket, user_id)
+
+    async def _writer(self, websocket: WebSocket, user_id: int):
+        """Drain one connection's queue onto the socket"""
+        outbox = self._outboxes[websocket]
+        while True:
+            message = await outbox.get()
+            try:
+                await asyncio.wait_for(websocket.send_json(message), timeout=self.send_timeout)
+                self.stats["sent"] += 1
+            except asyncio.TimeoutError:
+                self.stats["evicted_stalled"] += 1
+                print(f"[WS] Send to user {user_id} stalled, disconnecting slow client")
+                self._evict(websocket, user_id)
+                return
+            except Exception as e:
+                self.stats["send_errors"] += 1
+                print(f"Error sending message to user {user_id}: {e}")
+                self._evict(websocket, user_id)
+                return
+
+    def _evict(self, websocket: WebSocket, user_id: int):
+        """Drop a connection and close its socket in the background"""
+        self.disconnect(websocket, user_id)
+        closer = asyncio.create_task(self._close(websocket))
+        self._closers.add(closer)
+        closer.add_done_callback(self._closers.discard)
+
+    async def _close(self, websocket: WebSocket):
+        """Close a socket without waiting on an unresponsive client"""
+        try:
+            await asyncio.wait_for(websocket.close(code=1013), timeout=self.send_timeout)
+        except Exception:
+            pass
 
 
 # Global connection manager instance
 manager = ConnectionManager()
-
@@ -0,0 +1,147 @@
+"""
+List endpoint throughput benchmark (100-row pages)
+
+Seeds a scratch SQLite database and requests 100-row pages from the list
+endpoints through the ASGI app (no network), reporting pages per second.
+It then times serialization alone for one page of each list, in two ways:
+the former path (ORM objects validated through the from_attributes
+response models) and the current one (column rows encoded with orjson).
+
+Run:
+    python benchmarks/list_endpoints.py --rows 5000 --requests 300
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Point the app at a scratch database before its settings are loaded
+SCRATCH = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{SCRATCH}/list_endpoints.db"
+os.environ["DEBUG"] = "false"
+
+import httpx  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+from app.database import AsyncSessionLocal, Base, SessionLocal, get_engine  # noqa: E402
+from app.models import Debt, DebtStatus, Message, Task, TaskStatus, User  # noqa: E402
+from app.schemas import DebtResponse, MessageResponse, Page, TaskResponse, UserResponse  # noqa: E402
+from app.auth.jwt import create_access_token  # noqa: E402
+from app.responses import FastJSONResponse, response_columns  # noqa: E402
+from app.pagination import page_items  # noqa: E402
+
+PAGE = 100
+
+ENDPOINTS = {
+    "GET /api/messages/": f"/api/messages/?limit={PAGE}",
+    "GET /api/tasks/": f"/api/tasks/?limit={PAGE}",
+    "GET /api/debts/history": f"/api/debts/history?limit={PAGE}",
+    "GET /api/users/": f"/api/users/?limit={PAGE}",
+}
+
+
+def seed(rows: int):
+    """Schema plus rows messages, tasks and debts between users 1 and 2"""
+    Base.metadata.create_all(bind=get_engine())
+    with SessionLocal() as db:
+        db.add_all([
+            User(username=f"user{i}", email=f"user{i}@example.com", hashed_password="x")
+            for i in range(1, PAGE + 1)
+        ])
+        db.flush()
+        analysis = {"type": "expense", "item": "ekmek", "amount": 25.0, "confidence": 0.98}
+        db.add_all([
+            Message(sender_id=1 + i % 2, receiver_id=2 - i % 2, content=f"ekmek aldım 25 tl #{i}", ai_analysis=analysis)
+            for i in range(rows)
+        ])
+        db.add_all([
+            Task(created_by=1 + i % 2, assigned_to=2 - i % 2, item_name=f"ekmek {i}", status=TaskStatus.PENDING)
+            for i in range(rows)
+        ])
+        db.add_all([
+            Debt(debtor_id=2 - i % 2, creditor_id=1 + i % 2, amount=12.5, status=DebtStatus.ACTIVE)
+            for i in range(rows)
+        ])
+        db.commit()
+
+
+async def endpoint_throughput(requests: int) -> dict:
+    """Pages per second of each list endpoint, requested one after another"""
+    import main
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'user1', 'uid': 1})}"}
+    results = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for label, url in ENDPOINTS.items():
+            assert (await client.get(url, headers=headers)).status_code == 200
+            started = time.perf_counter()
+            for _ in range(requests):
+                await client.get(url, headers=headers)
+            results[label] = requests / (time.perf_counter() - started)
+    return results
+
+
+async def serialization_times(repeats: int) -> dict:
+    """Milliseconds to serialize one page: ORM + response model vs rows + orjson"""
+    lists = {
+        "messages": (Message, MessageResponse, True),
+        "tasks": (Task, TaskResponse, True),
+        "debts": (Debt, DebtResponse, True),
+        "users": (User, UserResponse, False),
+    }
+    results = {}
+    async with AsyncSessionLocal() as db:
+        for label, (model, schema, paged) in lists.items():
+            objects = (await db.execute(select(model).limit(PAGE))).scalars().all()
+            rows = (await db.execute(select(*response_columns(schema, model)).limit(PAGE))).all()
+            adapter = TypeAdapter(Page[schema] if paged else list[schema])
+
+            def orm_path():
+                content = page_items(objects, PAGE) if paged else objects
+                return adapter.dump_json(adapter.validate_python(content, from_attributes=True))
+
+            def row_path():
+                items = [row._asdict() for row in rows]
+                return FastJSONResponse({"items": items, "next_cursor": None} if paged else items).body
+
+            timings = []
+            for path in (orm_path, row_path):
+                started = time.perf_counter()
+                for _ in range(repeats):
+                    path()
+                timings.append((time.perf_counter() - started) / repeats * 1000)
+            results[label] = timings
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000, help="messages, tasks and debts to seed")
+    parser.add_argument("--requests", type=int, default=300, help="requests per endpoint")
+    parser.add_argument("--repeats", type=int, default=1000, help="serializations per list")
+    args = parser.parse_args()
+
+    seed(args.rows)
+
+    async def run():
+        return await endpoint_throughput(args.requests), await serialization_times(args.repeats)
+
+    throughput, serialization = asyncio.run(run())
+
+    print(f"\n{'endpoint (100-row pages)':28} {'pages/s':>8}")
+    for label, pages_per_second in throughput.items():
+        print(f"{label:28} {pages_per_second:8.0f}")
+
+    print(f"\n{'serialize one page':28} {'ORM ms':>8} {'rows ms':>8} {'speedup':>8}")
+    for label, (orm_ms, row_ms) in serialization.items():
+        print(f"{label:28} {orm_ms:8.3f} {row_ms:8.3f} {orm_ms / row_ms:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Event-loop stall benchmark for password hashing
+
+Fires a burst of concurrent password verifications the way the login
+endpoint used to (inline on the event loop) and the way it does now
+(app.auth.password.password_hasher), while a ticker coroutine measures
+how late the loop wakes it up. Inline hashing delays every other task on
+the worker for the whole burst; the offloaded version keeps the loop free.
+
+Run:
+    python benchmarks/password_hashing.py --logins 32 --rounds 12
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+TICK_SECONDS = 0.005
+
+
+async def ticker(lags: list, stop: asyncio.Event):
+    """Record how much later than requested each short sleep returns"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append((time.perf_counter() - started - TICK_SECONDS) * 1000)
+
+
+async def run_burst(verify, logins: int, password: str, hashed: str) -> dict:
+    """Run the burst next to the ticker and summarize the loop lag"""
+    lags, stop = [], asyncio.Event()
+    tick_task = asyncio.create_task(ticker(lags, stop))
+    await asyncio.sleep(TICK_SECONDS * 2)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(verify(password, hashed) for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await tick_task
+    return {
+        "elapsed_s": elapsed,
+        "max_lag_ms": max(lags) if lags else 0.0,
+        "p50_lag_ms": statistics.median(lags) if lags else 0.0,
+        "ticks": len(lags)
+    }
+
+
+async def main_async(args):
+    from app.auth.password import PasswordHasher, pwd_context
+
+    password = "benchmark-password"
+    hashed = pwd_context.hash(password, rounds=args.rounds)
+
+    async def inline(plain, stored):
+        return pwd_context.verify_and_update(plain, stored)
+
+    hasher = PasswordHasher(workers=args.workers, max_waiting=args.logins)
+
+    results = {
+        "inline": await run_burst(inline, args.logins, password, hashed),
+        "offloaded": await run_burst(hasher.verify_and_update, args.logins, password, hashed)
+    }
+    hasher.shutdown()
+
+    print(f"{args.logins} logins, bcrypt cost {args.rounds}, {args.workers} hash workers\n")
+    print(f"{'mode':10} {'burst s':>8} {'max lag ms':>11} {'p50 lag ms':>11} {'ticks':>6}")
+    for mode, r in results.items():
+        print(f"{mode:10} {r['elapsed_s']:8.2f} {r['max_lag_ms']:11.1f} {r['p50_lag_ms']:11.2f} {r['ticks']:6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost")
+    parser.add_argument("--workers", type=int, default=4)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Settle-up planner benchmark
+
+Builds random debt graphs (members x average debts per member), computes
+net positions and plans transfers with app.ledger.planner, then checks
+that applying the transfers zeroes every position. Reports planning time
+and the number of transfers next to the number of debts they replace.
+
+Run:
+    python benchmarks/settle_plan.py --members 10 100 1000 10000 --debts-per-member 5
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.ledger.planner import net_positions, plan_transfers  # noqa: E402
+
+
+def random_pair_balances(members: int, debts_per_member: int):
+    """(user_a, user_b, net_amount) rows like the balances table holds"""
+    pairs = defaultdict(float)
+    for _ in range(members * debts_per_member):
+        debtor, creditor = random.sample(range(1, members + 1), 2)
+        amount = random.randint(100, 50_000) / 100
+        user_a, user_b = sorted((debtor, creditor))
+        # net_amount is positive when user_b owes user_a
+        pairs[(user_a, user_b)] += amount if debtor == user_b else -amount
+    return [(a, b, net) for (a, b), net in pairs.items()]
+
+
+def check(positions, transfers) -> bool:
+    """Every position is zero after the transfers"""
+    remaining = dict(positions)
+    for debtor, creditor, amount in transfers:
+        cents = round(amount * 100)
+        remaining[debtor] += cents
+        remaining[creditor] -= cents
+    return all(cents == 0 for cents in remaining.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", type=int, nargs="+", default=[10, 100, 1000, 10000, 100000])
+    parser.add_argument("--debts-per-member", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'members':>8} {'pair debts':>11} {'transfers':>10} {'plan ms':>9} {'valid':>6}")
+    for members in args.members:
+        pair_balances = random_pair_balances(members, args.debts_per_member)
+        timings = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            positions = net_positions(pair_balances)
+            transfers = plan_transfers(positions)
+            timings.append((time.perf_counter() - start) * 1000)
+        valid = check(positions, transfers)
+        print(f"{members:>8} {len(pair_balances):>11} {len(transfers):>10} {statistics.median(timings):>9.2f} {str(valid):>6}")
+
+
+if __name__ == "__main__":
+    main()
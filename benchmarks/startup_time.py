@@ -0,0 +1,75 @@
+"""
+Application startup benchmark
+
+Starts fresh Python processes that import main and serve their first
+request (GET /health through the startup hooks), and reports the median
+import time, time to first request and total. Each run is a new process,
+so nothing is shared between runs, like a restarted or newly scaled worker.
+
+Importing the app must not need a database or GOOGLE_API_KEY; the
+benchmark unsets the key and points DATABASE_URL at an empty scratch
+SQLite file unless --database-url is given.
+
+Run:
+    python benchmarks/startup_time.py --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Runs inside each child process
+CHILD = """
+import json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    assert client.get("/health").status_code == 200
+    served = time.perf_counter()
+print(json.dumps({"import_s": imported - started, "first_request_s": served - imported}))
+"""
+
+
+def run_once(env: dict) -> dict:
+    """Start one child process and return its timings"""
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--database-url", help="defaults to an empty scratch SQLite file")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp()
+    env = dict(os.environ)
+    env.pop("GOOGLE_API_KEY", None)
+    env["DATABASE_URL"] = args.database_url or f"sqlite:///{scratch}/startup.db"
+    env["DEBUG"] = "false"
+
+    # The first run warms the bytecode cache; it is not measured
+    run_once(env)
+    runs = [run_once(env) for _ in range(args.runs)]
+
+    print(f"{args.runs} fresh processes, DATABASE_URL={env['DATABASE_URL']}\n")
+    for key, label in (("import_s", "import main"), ("first_request_s", "startup + first request")):
+        values = [r[key] * 1000 for r in runs]
+        print(f"{label:24} median {statistics.median(values):7.1f} ms   max {max(values):7.1f} ms")
+    totals = [(r["import_s"] + r["first_request_s"]) * 1000 for r in runs]
+    print(f"{'total':24} median {statistics.median(totals):7.1f} ms   max {max(totals):7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""
+Debt compaction - Net each pair's active debts into one and archive old settled debts
+Run: python compact_debts.py              (archive settled debts older than DEBT_ARCHIVE_MIN_AGE_DAYS)
+     python compact_debts.py --min-age 0  (archive every settled debt)
+"""
+import argparse
+import asyncio
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.ledger.compaction import compact_all
+
+
+async def main(min_age_days: int):
+    """Compact all pairs and report what was done"""
+    print("🧹 Borç sıkıştırma başlatılıyor...\n")
+    async with AsyncSessionLocal() as db:
+        stats = await compact_all(db, min_age_days)
+
+    print(f"✅ {stats['pairs']} kullanıcı çiftinde {stats['netted']} aktif borç netleştirildi")
+    print(f"📦 {stats['archived']} kapanmış borç arşive taşındı")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Borçları netleştir ve kapanmış borçları arşivle")
+    parser.add_argument(
+        "--min-age", type=int, default=settings.DEBT_ARCHIVE_MIN_AGE_DAYS,
+        help="Bu kadar günden eski kapanmış borçları arşivle"
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.min_age))
@@ -1,54 +1,17 @@
-from fastapi import FastAPI, WebSocket, Depends
+import asyncio
+from fastapi import FastAPI, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
 from app.config import settings
-from app.database import Base, engine, get_db, SessionLocal
-from app.api import auth, users, messages, tasks, debts
-from app.websocket.handlers import handle_websocket_connection
-from app.models import User
-from app.auth.password import get_password_hash
-
-# Create database tables
-Base.metadata.create_all(bind=engine)
-
-
-def create_default_users():
-    """Create default users (Can and Yusuf) on startup if they don't exist"""
-    db = SessionLocal()
-    try:
-        can = db.query(User).filter(User.username == "can").first()
-        yusuf = db.query(User).filter(User.username == "yusuf").first()
-        
-        users_created = []
-        
-        if not can:
-            can = User(
-                username="can",
-                email="can@example.com",
-                hashed_password=get_password_hash("123456")
-            )
-            db.add(can)
-            users_created.append("Can")
-        
-        if not yusuf:
-            yusuf = User(
-                username="yusuf",
-                email="yusuf@example.com",
-                hashed_password=get_password_hash("123456")
-            )
-            db.add(yusuf)
-            users_created.append("Yusuf")
-        
-        if users_created:
-            db.commit()
-            print(f"\n✅ Otomatik kullanıcılar oluşturuldu: {', '.join(users_created)}")
-            print("📱 Giriş bilgileri: username='can/yusuf', password='123456'\n")
-    
-    except Exception as e:
-        print(f"⚠️  Kullanıcı oluşturma hatası: {e}")
-        db.rollback()
-    finally:
-        db.close()
+from app.api import auth, users, messages, tasks, debts, groups
+from app.websocket.handlers import handle_websocket_connection, send_analysis_result
+from app.ai.queue import analysis_queue
+from app.ai.rules import rule_classifier
+from app.ai.cache import analysis_cache
+from app.ai.batcher import gemini_batcher
+from app.ai.gemini import get_model
+from app.websocket.manager import manager
+from app.ledger.compaction import compaction_loop
+from app.auth.password import password_hasher
 
 
 # Initialize FastAPI app
@@ -61,10 +24,38 @@ app = FastAPI(
 )
 
 
+def _log_gemini_warmup(future: asyncio.Future):
+    """Report a failed background Gemini load; the first request retries it"""
+    if not future.cancelled() and future.exception() is not None:
+        print(f"[GEMINI] Background model load failed: {future.exception()}")
+
+
 @app.on_event("startup")
 async def startup_event():
     """Run on application startup"""
-    create_default_users()
+    await manager.start()
+    await analysis_queue.start(result_handler=send_analysis_result)
+    
+    app.state.compaction_task = None
+    if settings.DEBT_COMPACTION_INTERVAL_SECONDS > 0:
+        app.state.compaction_task = asyncio.create_task(compaction_loop())
+    
+    # Load the Gemini SDK in the background; startup does not wait for it
+    app.state.gemini_warmup = None
+    if settings.GOOGLE_API_KEY:
+        app.state.gemini_warmup = asyncio.get_running_loop().run_in_executor(None, get_model)
+        app.state.gemini_warmup.add_done_callback(_log_gemini_warmup)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Run on application shutdown"""
+    if app.state.compaction_task:
+        app.state.compaction_task.cancel()
+    await analysis_queue.stop()
+    await gemini_batcher.stop()
+    await manager.stop()
+    password_hasher.shutdown()
 
 # CORS middleware
 app.add_middleware(
@@ -81,6 +72,7 @@ app.include_router(users.router)
 app.include_router(messages.router)
 app.include_router(tasks.router)
 app.include_router(debts.router)
+app.include_router(groups.router)
 
 
 @app.get("/")
@@ -100,10 +92,38 @@ async def health_check():
     return {"status": "healthy", "version": settings.APP_VERSION}
 
 
+@app.get("/metrics")
+async def metrics():
+    """In-process performance counters"""
+    return {
+        "analysis_queue": {
+            **analysis_queue.stats,
+            "queue_size": analysis_queue.queue_size()
+        },
+        "rule_classifier": {
+            **rule_classifier.stats,
+            "hit_rate": rule_classifier.hit_rate()
+        },
+        "analysis_cache": {
+            **analysis_cache.stats,
+            "size": len(analysis_cache),
+            "hit_rate": analysis_cache.hit_rate()
+        },
+        "gemini_batcher": {
+            **gemini_batcher.stats,
+            "average_batch_size": gemini_batcher.average_batch_size()
+        },
+        "websocket": {
+            **manager.stats,
+            "connections": manager.connection_count()
+        }
+    }
+
+
 @app.websocket("/ws/{token}")
-async def websocket_endpoint(websocket: WebSocket, token: str, db: Session = Depends(get_db)):
+async def websocket_endpoint(websocket: WebSocket, token: str):
     """WebSocket endpoint for real-time messaging"""
-    await handle_websocket_connection(websocket, token, db)
+    await handle_websocket_connection(websocket, token)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,37 @@
+"""
+Balance table maintenance - Check or rebuild pairwise balances from active debts
+Run: python rebuild_balances.py          (rebuild)
+     python rebuild_balances.py --check  (only report mismatches)
+"""
+import asyncio
+import sys
+from app.database import AsyncSessionLocal
+from app.ledger.balances import check_balances, rebuild_balances
+
+
+async def main(check_only: bool):
+    """Compare the balance table with active debts and rebuild it if asked"""
+    async with AsyncSessionLocal() as db:
+        mismatches = await check_balances(db)
+
+        if not mismatches:
+            print("✅ Bakiye tablosu borçlarla tutarlı")
+        else:
+            print(f"⚠️  {len(mismatches)} kullanıcı çiftinde tutarsızlık bulundu:")
+            for m in mismatches:
+                print(
+                    f"   • {m['user_a']} ↔ {m['user_b']}: "
+                    f"beklenen {m['expected_a_owes']:.2f}/{m['expected_b_owes']:.2f}, "
+                    f"kayıtlı {m['stored_a_owes']:.2f}/{m['stored_b_owes']:.2f}"
+                )
+
+        if check_only:
+            return 1 if mismatches else 0
+
+        count = await rebuild_balances(db)
+        print(f"✨ Bakiye tablosu yeniden oluşturuldu ({count} çift)")
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main("--check" in sys.argv)))
@@ -1,8 +1,10 @@
 """
 Database seed script - Create default users for testing
 Run: python seed_db.py
+     python seed_db.py --create-schema  (also create tables without Alembic, e.g. for SQLite)
 """
-from app.database import SessionLocal
+import sys
+from app.database import Base, SessionLocal, get_engine
 from app.models import User
 from app.auth.password import get_password_hash
 
@@ -65,6 +67,14 @@ def seed_database():
         db.close()
 
 
+def create_schema():
+    """Create all tables from the models (development shortcut for alembic upgrade head)"""
+    Base.metadata.create_all(bind=get_engine())
+    print("🗄️  Tablolar oluşturuldu\n")
+
+
 if __name__ == "__main__":
+    if "--create-schema" in sys.argv[1:]:
+        create_schema()
     seed_database()
 